@@ -0,0 +1,66 @@
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from testcontainers.postgres import PostgresContainer
+
+from madr_fastapi.app import app
+from madr_fastapi.database import get_session
+from madr_fastapi.models import table_registry
+from madr_fastapi.ratelimit import limit_login, limit_signup
+
+
+@contextmanager
+def postgres_url():
+    with PostgresContainer('postgres:18', driver='psycopg') as postgres:
+        yield postgres.get_connection_url()
+
+
+@asynccontextmanager
+async def app_client(url: str):
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(table_registry.metadata.create_all)
+
+    async def get_session_override():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_session_override
+    # Benchmarks log in far faster than any real client would.
+    app.dependency_overrides[limit_login] = lambda: None
+    app.dependency_overrides[limit_signup] = lambda: None
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url='http://bench'
+        ) as client:
+            yield client, engine
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+
+
+def percentile(samples: list[float], pct: float):
+    ordered = sorted(samples)
+    index = round(pct / 100 * (len(ordered) - 1))
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def summarize(name: str, samples: list[float]):
+    return (
+        f'{name:<28} n={len(samples):<6} '
+        f'p50={percentile(samples, 50) * 1000:8.2f}ms '
+        f'p95={percentile(samples, 95) * 1000:8.2f}ms '
+        f'p99={percentile(samples, 99) * 1000:8.2f}ms'
+    )
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
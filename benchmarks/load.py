@@ -0,0 +1,277 @@
+"""In-process load test with a stored baseline for regression checks.
+
+    python -m benchmarks.load --save-baseline
+    python -m benchmarks.load --tolerance 0.2
+
+Seeds a synthetic catalogue with the factories from tests/conftest.py,
+drives concurrent requests against the ASGI app and reports throughput
+and p50/p95/p99 per endpoint. The list endpoints run twice: once with
+the catalogue cache disabled, so every request reaches the database,
+and once with it enabled, reporting the cache hit ratio. The run exits
+non-zero when any endpoint's p95 rises, or its throughput drops, by
+more than the tolerance, and also when there is no baseline to compare
+against. Pass --database-url to reuse an existing database instead of
+starting a Postgres container.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from time import perf_counter
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from benchmarks.common import app_client, percentile, postgres_url
+from madr_fastapi.cache import MemoryCacheBackend, catalogue_cache
+from madr_fastapi.models import Book, Novelist
+from madr_fastapi.security import get_password_hash
+from tests.conftest import BookFactory, NovelistFactory, UserFactory
+
+BASELINE = Path(__file__).with_name('baseline.json')
+PASSWORD = 'secret'
+
+
+async def seed(session: AsyncSession, args, rng: random.Random):
+    users, novelists, books = args.users, args.novelists, args.books
+    chunk = 10_000
+    password = get_password_hash(PASSWORD)
+    session.add_all(
+        UserFactory(
+            username=f'load{n}',
+            email=f'load{n}@example.com',
+            password=password,
+        )
+        for n in range(users)
+    )
+    await session.execute(
+        insert(Novelist),
+        [{'name': n.name} for n in NovelistFactory.build_batch(novelists)],
+    )
+    for start in range(0, books, chunk):
+        batch = BookFactory.build_batch(min(chunk, books - start))
+        await session.execute(
+            insert(Book),
+            [
+                {
+                    'title': book.title,
+                    'year': rng.randint(1800, 2024),
+                    'novelist_id': rng.randint(1, novelists),
+                }
+                for book in batch
+            ],
+        )
+    await session.commit()
+
+
+async def auth_token(client, ctx):
+    rng = ctx['rng']
+    return await client.post(
+        '/auth/token',
+        data={
+            'username': f'load{rng.randrange(ctx["users"])}@example.com',
+            'password': PASSWORD,
+        },
+    )
+
+
+async def list_books(client, ctx):
+    rng = ctx['rng']
+    params = rng.choice((
+        {'offset': rng.randrange(0, 1000, 20)},
+        {'title': f'nome {rng.randint(1990, 2090)}'},
+        {'year_from': rng.randint(1800, 2000), 'limit': 50},
+    ))
+    return await client.get('/livro/', params=params, headers=ctx['headers'])
+
+
+async def list_novelists(client, ctx):
+    rng = ctx['rng']
+    params = rng.choice((
+        {'offset': rng.randrange(0, 500, 20)},
+        {'name': f'nome {rng.randrange(ctx["novelists"])}'},
+    ))
+    return await client.get(
+        '/romancista/', params=params, headers=ctx['headers']
+    )
+
+
+SCENARIOS = {
+    'POST /auth/token': auth_token,
+    'GET /livro/': list_books,
+    'GET /romancista/': list_novelists,
+}
+CACHED_SCENARIOS = {'GET /livro/', 'GET /romancista/'}
+
+
+async def drive(client, scenario, ctx, requests, concurrency):
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = perf_counter()
+            response = await scenario(client, ctx)
+            latencies.append(perf_counter() - start)
+            errors += response.is_error
+
+    start = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - start
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: p95 {base["p95_ms"]:.2f}ms -> '
+                f'{result["p95_ms"]:.2f}ms'
+            )
+        if result['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(
+                f'{name}: throughput {base["rps"]:.1f}/s -> '
+                f'{result["rps"]:.1f}/s'
+            )
+    return regressions
+
+
+@contextmanager
+def catalogue_cache_disabled():
+    # A backend that keeps nothing makes every lookup a miss.
+    backend = catalogue_cache.backend
+    catalogue_cache.backend = MemoryCacheBackend(maxsize=0, ttl=0)
+    try:
+        yield
+    finally:
+        catalogue_cache.backend = backend
+
+
+async def run_scenario(client, scenario, ctx, requests, cached: bool):
+    await catalogue_cache.clear()
+    with nullcontext() if cached else catalogue_cache_disabled():
+        result = await drive(
+            client, scenario, ctx, requests, ctx['concurrency']
+        )
+    lookups = catalogue_cache.hits + catalogue_cache.misses
+    if lookups:
+        result['hit_ratio'] = catalogue_cache.hits / lookups
+    return result
+
+
+def report(name, r):
+    line = (
+        f'{name:<28} n={r["requests"]:<6} '
+        f'rps={r["rps"]:8.1f} '
+        f'p50={r["p50_ms"]:8.2f}ms '
+        f'p95={r["p95_ms"]:8.2f}ms '
+        f'p99={r["p99_ms"]:8.2f}ms '
+        f'errors={r["errors"]}'
+    )
+    if 'hit_ratio' in r:
+        line += f' hits={r["hit_ratio"]:.0%}'
+    print(line)
+
+
+@contextmanager
+def database(url: str | None):
+    if url:
+        yield url
+        return
+    with postgres_url() as container_url:
+        yield container_url
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    results = {}
+    with database(args.database_url) as url:
+        async with app_client(url) as (client, engine):
+            async with AsyncSession(engine) as session:
+                await seed(session, args, rng)
+
+            response = await client.post(
+                '/auth/token',
+                data={'username': 'load0@example.com', 'password': PASSWORD},
+            )
+            token = response.json()['access_token']
+            ctx = {
+                'rng': rng,
+                'users': args.users,
+                'novelists': args.novelists,
+                'concurrency': args.concurrency,
+                'headers': {'Authorization': f'Bearer {token}'},
+            }
+
+            for name, scenario in SCENARIOS.items():
+                requests = (
+                    args.logins
+                    if name == 'POST /auth/token'
+                    else args.requests
+                )
+                runs = {name: True}
+                if name in CACHED_SCENARIOS:
+                    runs = {f'{name} uncached': False, f'{name} cached': True}
+                for run_name, cached in runs.items():
+                    results[run_name] = await run_scenario(
+                        client, scenario, ctx, requests, cached
+                    )
+                    report(run_name, results[run_name])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database-url')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--novelists', type=int, default=5_000)
+    parser.add_argument('--books', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=2_000)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + '\n')
+        print(f'baseline written to {args.baseline}')
+        return
+
+    if not args.baseline.exists():
+        print(f'no baseline at {args.baseline}; run with --save-baseline')
+        sys.exit(1)
+
+    failed = any(r['errors'] for r in results.values())
+    regressions = compare(
+        results, json.loads(args.baseline.read_text()), args.tolerance
+    )
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
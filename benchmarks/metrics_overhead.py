@@ -0,0 +1,62 @@
+"""Per-request cost of MetricsMiddleware.
+
+    python -m benchmarks.metrics_overhead --requests 200000
+
+Drives a trivial ASGI app with and without the middleware and reports
+the difference in microseconds per request.
+"""
+
+import argparse
+import asyncio
+from time import perf_counter
+
+from madr_fastapi.metrics import MetricsMiddleware
+
+
+class Route:
+    path = '/livro/{book_id}'
+
+
+async def endpoint(scope, receive, send):
+    scope['route'] = Route
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def receive():
+    return {'type': 'http.request', 'body': b''}
+
+
+async def send(message):
+    pass
+
+
+async def drive(app, requests: int):
+    start = perf_counter()
+    for _ in range(requests):
+        scope = {'type': 'http', 'method': 'GET', 'path': '/livro/1'}
+        await app(scope, receive, send)
+    return perf_counter() - start
+
+
+async def main(requests: int, rounds: int):
+    wrapped = MetricsMiddleware(endpoint)
+    await drive(wrapped, 1000)
+
+    overheads = []
+    for _ in range(rounds):
+        bare = await drive(endpoint, requests)
+        instrumented = await drive(wrapped, requests)
+        overheads.append((instrumented - bare) / requests * 1e6)
+
+    print(f'bare:         {bare / requests * 1e6:6.2f}us/request')
+    print(f'instrumented: {instrumented / requests * 1e6:6.2f}us/request')
+    print(f'overhead:     {min(overheads):6.2f}us/request (best of {rounds})')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200_000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.rounds))
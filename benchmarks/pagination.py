@@ -0,0 +1,74 @@
+"""Latency of a deep page with OFFSET versus keyset (cursor) pagination.
+
+python -m benchmarks.pagination --rows 200000 --page 1000 --limit 20
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from benchmarks.common import Timer, app_client, postgres_url, summarize
+from madr_fastapi.models import Book, Novelist
+from madr_fastapi.pagination import encode_cursor, paginate
+from madr_fastapi.schemas import BookFilterPage
+
+
+async def seed(session: AsyncSession, rows: int, chunk: int = 10_000):
+    session.add(Novelist(name='bench'))
+    await session.commit()
+    for start in range(0, rows, chunk):
+        await session.execute(
+            insert(Book),
+            [
+                {
+                    'title': f'book {n}',
+                    'year': 1900 + n % 120,
+                    'novelist_id': 1,
+                }
+                for n in range(start, min(start + chunk, rows))
+            ],
+        )
+    await session.commit()
+
+
+async def measure(session: AsyncSession, page: BookFilterPage, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        with Timer() as timer:
+            result = await session.scalars(
+                paginate(select(Book), Book.id, page)
+            )
+            result.all()
+        samples.append(timer.elapsed)
+    return samples
+
+
+async def main(rows: int, page: int, limit: int, repeat: int):
+    offset = (page - 1) * limit
+    with postgres_url() as url:
+        async with app_client(url) as (_, engine):
+            async with AsyncSession(engine) as session:
+                await seed(session, rows)
+
+                offset_page = BookFilterPage(offset=offset, limit=limit)
+                cursor_page = BookFilterPage(
+                    cursor=encode_cursor(offset), limit=limit
+                )
+                for name, filter_page in (
+                    ('offset', offset_page),
+                    ('cursor', cursor_page),
+                ):
+                    samples = await measure(session, filter_page, repeat)
+                    print(summarize(f'page {page} ({name})', samples))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--page', type=int, default=1000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.page, args.limit, args.repeat))
@@ -0,0 +1,78 @@
+"""p99 of a non-auth route while logins hash passwords concurrently.
+
+    python -m benchmarks.password_hashing --logins 50 --probes 300
+
+"inline" hashes on the event loop (the old behaviour), "pool" goes
+through security.hashing_pool.
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from benchmarks.common import Timer, app_client, postgres_url, summarize
+from madr_fastapi import security
+from madr_fastapi.models import User
+
+
+class InlinePool:
+    async def run(self, func, *args):  # noqa: PLR6301
+        return func(*args)
+
+
+async def scenario(client, email, password, logins, probes):
+    latencies = []
+    statuses = []
+
+    async def probe():
+        for _ in range(probes):
+            with Timer() as timer:
+                await client.get('/')
+            latencies.append(timer.elapsed)
+            await asyncio.sleep(0.001)
+
+    async def login():
+        response = await client.post(
+            '/auth/token', data={'username': email, 'password': password}
+        )
+        statuses.append(response.status_code)
+
+    await asyncio.gather(probe(), *(login() for _ in range(logins)))
+    return latencies, statuses
+
+
+async def main(logins: int, probes: int):
+    with postgres_url() as url:
+        async with app_client(url) as (client, engine):
+            async with AsyncSession(engine) as session:
+                session.add(
+                    User(
+                        username='bench',
+                        email='bench@madr.com',
+                        password=security.get_password_hash('secret'),
+                    )
+                )
+                await session.commit()
+
+            pool = security.hashing_pool
+            for name, hasher in (('inline', InlinePool()), ('pool', pool)):
+                security.hashing_pool = hasher
+                latencies, statuses = await scenario(
+                    client, 'bench@madr.com', 'secret', logins, probes
+                )
+                print(summarize(f'GET / ({name})', latencies))
+                print(
+                    f'{"":<28} logins ok={statuses.count(200)} '
+                    f'rejected={statuses.count(503)}'
+                )
+            security.hashing_pool = pool
+            pool.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=50)
+    parser.add_argument('--probes', type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.probes))
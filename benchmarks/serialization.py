@@ -0,0 +1,80 @@
+"""Serialization cost per 1k rows for the public response schemas.
+
+    python -m benchmarks.serialization --rows 1000 --repeat 200
+
+Compares the response_model path (validate each ORM row, validate the
+list again as the response model, then stdlib JSON) with dump_rows plus
+FastJSONResponse.
+"""
+
+import argparse
+import json
+
+from fastapi.encoders import jsonable_encoder
+
+from benchmarks.common import Timer, summarize
+from madr_fastapi.models import Book, Novelist, User
+from madr_fastapi.schemas import BookPublic, NovelistPublic, UserPublic
+from madr_fastapi.serialization import FastJSONResponse, dump_rows
+
+
+def make_rows(rows: int):
+    books, novelists, users = [], [], []
+    for n in range(1, rows + 1):
+        book = Book(title=f'book {n}', year=1900 + n % 120, novelist_id=1)
+        novelist = Novelist(name=f'novelist {n}')
+        user = User(
+            username=f'user{n}', email=f'user{n}@example.com', password='x'
+        )
+        book.id = novelist.id = user.id = n
+        books.append(book)
+        novelists.append(novelist)
+        users.append(user)
+    return {
+        BookPublic: books,
+        NovelistPublic: novelists,
+        UserPublic: users,
+    }
+
+
+def response_model_path(model, rows):
+    items = [
+        model.model_validate(row, from_attributes=True).model_dump()
+        for row in rows
+    ]
+    validated = [model.model_validate(item) for item in items]
+    return json.dumps(
+        jsonable_encoder(validated), ensure_ascii=False, separators=(',', ':')
+    ).encode()
+
+
+def fast_path(model, rows):
+    return FastJSONResponse(dump_rows(model, rows)).body
+
+
+def measure(func, model, rows, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        with Timer() as timer:
+            func(model, rows)
+        samples.append(timer.elapsed * 1000 / len(rows))
+    return samples
+
+
+def main(rows: int, repeat: int):
+    print(f'times are per 1k rows ({rows} rows per run)')
+    for model, objects in make_rows(rows).items():
+        for name, func in (
+            ('response_model', response_model_path),
+            ('dump_rows', fast_path),
+        ):
+            samples = measure(func, model, objects, repeat)
+            print(summarize(f'{model.__name__} ({name})', samples))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
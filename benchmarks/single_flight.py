@@ -0,0 +1,82 @@
+"""Database queries and latency for a burst of reads of the same book.
+
+    python -m benchmarks.single_flight --concurrency 200 --rounds 20
+
+Fires bursts of concurrent GET /livro/{id} requests with request
+coalescing enabled and disabled, counting the SELECTs against books.
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from benchmarks.common import Timer, app_client, postgres_url, summarize
+from madr_fastapi.cache import lookups
+from madr_fastapi.models import Book, Novelist, User
+from madr_fastapi.profiling import QueryCounter
+from madr_fastapi.security import get_password_hash
+
+
+async def seed(session: AsyncSession):
+    session.add(Novelist(name='bench'))
+    session.add(
+        User(
+            username='bench',
+            email='bench@example.com',
+            password=get_password_hash('secret'),
+        )
+    )
+    await session.commit()
+    session.add(Book(title='dom casmurro', year=1899, novelist_id=1))
+    await session.commit()
+
+
+async def burst(client, headers, concurrency: int):
+    async def timed():
+        with Timer() as timer:
+            response = await client.get('/livro/1', headers=headers)
+        response.raise_for_status()
+        return timer.elapsed
+
+    return await asyncio.gather(*(timed() for _ in range(concurrency)))
+
+
+async def main(concurrency: int, rounds: int):
+    with postgres_url() as url:
+        async with app_client(url) as (client, engine):
+            async with AsyncSession(engine) as session:
+                await seed(session)
+
+            response = await client.post(
+                '/auth/token',
+                data={'username': 'bench@example.com', 'password': 'secret'},
+            )
+            headers = {
+                'Authorization': f'Bearer {response.json()["access_token"]}'
+            }
+            await burst(client, headers, 1)
+
+            max_keys = lookups.max_keys
+            for name, limit in (('coalesced', max_keys), ('direct', 0)):
+                lookups.max_keys = limit
+                samples = []
+                with QueryCounter(engine) as queries:
+                    for _ in range(rounds):
+                        samples.extend(
+                            await burst(client, headers, concurrency)
+                        )
+                book_queries = sum(
+                    'FROM books' in statement
+                    for statement in queries.statements
+                )
+                print(summarize(name, samples), f'queries={book_queries}')
+            lookups.max_keys = max_keys
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.rounds))
@@ -0,0 +1,130 @@
+"""Cold start of the production launcher with and without preloading.
+
+    python -m benchmarks.startup --workers 4 --repeat 5
+
+Times a bare `import madr_fastapi.app` in a fresh interpreter, then
+starts `python -m madr_fastapi.server` with --preload and --no-preload
+and reports the time until the first response to GET / and until every
+worker has finished its lifespan startup. GET / does not touch the
+database, so placeholder settings are enough when none are configured.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from threading import Thread
+
+READY = 'Application startup complete'
+ENV = {
+    'DATABASE_URL': 'sqlite+aiosqlite:///:memory:',
+    'SECRET_KEY': 'benchmark',
+    'ALGORITHM': 'HS256',
+    'ACCESS_TOKEN_EXPIRE_MINUTES': '30',
+}
+
+
+def environment():
+    return ENV | os.environ
+
+
+# benchmarks.common imports the app, which is exactly what is being
+# timed here, so this module keeps to the standard library.
+def summarize(name: str, samples: list[float]):
+    return (
+        f'{name:<28} n={len(samples):<4} '
+        f'median={statistics.median(samples) * 1000:8.1f}ms '
+        f'max={max(samples) * 1000:8.1f}ms'
+    )
+
+
+def import_time():
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-c', 'import madr_fastapi.app'],
+        env=environment(),
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def first_response(url: str, deadline: float):
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.01)
+    raise TimeoutError(url)
+
+
+def start_server(args, preload: bool):
+    flag = '--preload' if preload else '--no-preload'
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            '-m',
+            'madr_fastapi.server',
+            '--workers',
+            str(args.workers),
+            '--port',
+            str(args.port),
+            '--no-access-log',
+            '--allow-per-process-state',
+            flag,
+        ],
+        env=environment(),
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+    ready = []
+
+    def watch():
+        for line in process.stderr:
+            if READY in line:
+                ready.append(time.perf_counter() - start)
+
+    watcher = Thread(target=watch, daemon=True)
+    watcher.start()
+    try:
+        deadline = time.monotonic() + args.timeout
+        first_response(f'http://127.0.0.1:{args.port}/', deadline)
+        first = time.perf_counter() - start
+        while len(ready) < args.workers and time.monotonic() < deadline:
+            time.sleep(0.01)
+        if len(ready) < args.workers:
+            raise TimeoutError('workers did not finish starting')
+        return first, ready[-1]
+    finally:
+        process.terminate()
+        process.wait()
+        watcher.join()
+
+
+def main(args):
+    samples = [import_time() for _ in range(args.repeat)]
+    print(summarize('import madr_fastapi.app', samples))
+
+    for preload in (True, False):
+        name = 'preload' if preload else 'no-preload'
+        first, all_ready = [], []
+        for _ in range(args.repeat):
+            first_at, ready_at = start_server(args, preload)
+            first.append(first_at)
+            all_ready.append(ready_at)
+        print(summarize(f'{name} first response', first))
+        print(summarize(f'{name} all workers ready', all_ready))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--timeout', type=float, default=30)
+    main(parser.parse_args())
@@ -2,4 +2,4 @@
 
 poetry run alembic upgrade head
 
-poetry run uvicorn --host 0.0.0.0 --port 8000 madr_fastapi.app:app 
\ No newline at end of file
+exec poetry run python -m madr_fastapi.server
\ No newline at end of file
@@ -1,25 +1,53 @@
 import asyncio
 import sys
+from contextlib import asynccontextmanager
 from http import HTTPStatus
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
+from madr_fastapi.database import engine
+from madr_fastapi.metrics import MetricsMiddleware, render_metrics
+from madr_fastapi.profiling import SQLProfilerMiddleware
+from madr_fastapi.replicas import replica_router
 from madr_fastapi.routers import auth, contas, livros, romancistas
 from madr_fastapi.schemas import Message
+from madr_fastapi.security import hashing_pool
 
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    hashing_pool.shutdown()
+    for read_engine in replica_router.engines:
+        await read_engine.dispose()
+    await engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(auth.router)
 app.include_router(contas.router)
 app.include_router(livros.router)
 app.include_router(romancistas.router)
 
 app.add_middleware(CORSMiddleware, allow_origins=['localhost:5432'])
+app.add_middleware(SQLProfilerMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get('/', status_code=HTTPStatus.OK, response_model=Message)
 def main():
     return {'message': 'Seja bem-vindo(a) ao Meu Acervo Digital de Romances'}
+
+
+# async so the gauges are written from the event loop like every other
+# metric, not from the threadpool.
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(
+        render_metrics(), media_type='text/plain; version=0.0.4'
+    )
@@ -0,0 +1,311 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime
+from time import monotonic
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from madr_fastapi.models import User
+from madr_fastapi.settings import Settings
+
+_redis_clients = {}
+
+
+def redis_client(url: str):
+    # The caches and the rate limiter share one client, and so one
+    # connection pool, per URL.
+    client = _redis_clients.get(url)
+    if client is None:
+        try:
+            from redis.asyncio import Redis  # noqa: PLC0415
+        except ImportError as exc:
+            raise RuntimeError(
+                'CACHE_URL is set but the "redis" package is not installed'
+            ) from exc
+
+        client = _redis_clients[url] = Redis.from_url(url)
+    return client
+
+
+async def delete_prefix(client, prefix: str):
+    async for key in client.scan_iter(match=f'{prefix}*'):
+        await client.delete(key)
+
+
+class MemoryCacheBackend:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._counters: dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._data)
+
+    async def get(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            return None
+
+        expires_at, value = item
+        if expires_at <= monotonic():
+            self._data.pop(key, None)
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str):
+        self._data[key] = (monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def incr(self, key: str):
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def counter(self, key: str):
+        return self._counters.get(key, 0)
+
+    async def clear(self):
+        self._data.clear()
+        self._counters.clear()
+
+
+class RedisCacheBackend:
+    def __init__(self, client, ttl: float, prefix: str = 'madr:'):
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = client
+
+    async def get(self, key: str):
+        value = await self._redis.get(self.prefix + key)
+        return value.decode() if value is not None else None
+
+    async def set(self, key: str, value: str):
+        await self._redis.set(
+            self.prefix + key, value, ex=max(int(self.ttl), 1)
+        )
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._redis.delete(*(self.prefix + key for key in keys))
+
+    async def incr(self, key: str):
+        return await self._redis.incr(self.prefix + key)
+
+    async def counter(self, key: str):
+        value = await self._redis.get(self.prefix + key)
+        return int(value) if value is not None else 0
+
+    async def clear(self):
+        await delete_prefix(self._redis, self.prefix)
+
+
+def create_cache_backend(
+    url: str | None, maxsize: int, ttl: float, prefix: str = 'madr:'
+):
+    if url:
+        return RedisCacheBackend(redis_client(url), ttl, prefix)
+    return MemoryCacheBackend(maxsize, ttl)
+
+
+# The password hash never leaves the database: nothing that reads a
+# cached user needs it, and with CACHE_URL set it would land in Redis.
+CACHED_USER_COLUMNS = tuple(
+    column.key for column in User.__table__.columns if column.key != 'password'
+)
+
+
+def _dump_user(user: User):
+    data = {}
+    for key in CACHED_USER_COLUMNS:
+        value = getattr(user, key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        data[key] = value
+    return json.dumps(data)
+
+
+def _load_user(raw: str):
+    data = json.loads(raw)
+    user = User(
+        username=data['username'],
+        email=data['email'],
+        password='',
+    )
+    # Left unloaded, the hash is expired by make_transient_to_detached
+    # and merging the user never copies it over the session's row.
+    del user.password
+    user.id = data['id']
+    user.token_version = data.get('token_version', 0)
+    for key in ('created_at', 'updated_at'):
+        if data.get(key):
+            setattr(user, key, datetime.fromisoformat(data[key]))
+
+    make_transient_to_detached(user)
+    return user
+
+
+class UserCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(subject):
+        return f'user:{subject}'
+
+    async def get(self, subject):
+        raw = await self.backend.get(self._key(subject))
+        if raw is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return _load_user(raw)
+
+    async def set(self, subject, user: User):
+        await self.backend.set(self._key(subject), _dump_user(user))
+
+    async def invalidate(self, *subjects):
+        await self.backend.delete(*(self._key(s) for s in subjects))
+
+    async def clear(self):
+        await self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class TokenVersionCache:
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def _key(user_id):
+        return f'version:{user_id}'
+
+    async def get(self, user_id):
+        raw = await self.backend.get(self._key(user_id))
+        return int(raw) if raw is not None else None
+
+    async def set(self, user_id, version: int):
+        await self.backend.set(self._key(user_id), str(version))
+
+    async def invalidate(self, *user_ids):
+        await self.backend.delete(*(self._key(i) for i in user_ids))
+
+    async def clear(self):
+        await self.backend.clear()
+
+
+class SingleFlight:
+    def __init__(self, max_keys: int = 10_000):
+        self.max_keys = max_keys
+        self._calls: dict[str, asyncio.Future] = {}
+        self.shared = 0
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key: str, func):
+        while (future := self._calls.get(key)) is not None:
+            self.shared += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # A cancelled leader must not cancel callers that were
+                # only waiting on it; they retry, one of them as leader.
+                if asyncio.current_task().cancelling():
+                    raise
+                if not future.cancelled():
+                    raise
+
+        if len(self._calls) >= self.max_keys:
+            return await func()
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark the outcome as retrieved so a failure nobody waited on
+        # is not reported as "exception was never retrieved".
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+
+class ResponseCache:
+    def __init__(self, backend, max_in_flight: int = 10_000):
+        self.backend = backend
+        self.single_flight = SingleFlight(max_in_flight)
+        self.hits = 0
+        self.misses = 0
+
+    async def _key(self, namespace: str, params: dict):
+        generation = await self.backend.counter(f'generation:{namespace}')
+        digest = hashlib.sha256(
+            json.dumps(params, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return f'{namespace}:{generation}:{digest[:32]}'
+
+    async def get_or_load(
+        self, namespace: str, params: dict, loader, bypass: bool = False
+    ):
+        if bypass:
+            return await loader()
+
+        key = await self._key(namespace, params)
+        raw = await self.backend.get(key)
+        if raw is not None:
+            self.hits += 1
+            return json.loads(raw)
+
+        self.misses += 1
+        return await self.single_flight.do(
+            key, lambda: self._load(key, loader)
+        )
+
+    async def _load(self, key: str, loader):
+        value = await loader()
+        await self.backend.set(key, json.dumps(value))
+        return value
+
+    async def invalidate(self, *namespaces: str):
+        for namespace in namespaces:
+            await self.backend.incr(f'generation:{namespace}')
+
+    async def clear(self):
+        await self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+settings = Settings()
+catalogue_cache = ResponseCache(
+    create_cache_backend(
+        settings.CACHE_URL,
+        settings.CATALOGUE_CACHE_MAX_SIZE,
+        settings.CATALOGUE_CACHE_TTL_SECONDS,
+        prefix='madr:catalogue:',
+    ),
+    settings.SINGLE_FLIGHT_MAX_KEYS,
+)
+lookups = SingleFlight(settings.SINGLE_FLIGHT_MAX_KEYS)
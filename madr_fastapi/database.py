@@ -1,8 +1,113 @@
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from madr_fastapi.profiling import profiler
 from madr_fastapi.settings import Settings
 
-engine = create_async_engine(url=Settings().DATABASE_URL)
+settings = Settings()
+
+
+class PoolStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float):
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        # dispose() swaps in a fresh pool; the counters carry over.
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def connect(self):
+        start = perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.record_wait(perf_counter() - start)
+
+
+def engine_options(settings: Settings):
+    connect_args = {}
+    if settings.DATABASE_PGBOUNCER:
+        # PgBouncer in transaction mode hands each transaction to a
+        # different server connection, so prepared statements and
+        # startup parameters cannot be relied upon.
+        connect_args['prepare_threshold'] = None
+    elif settings.DATABASE_STATEMENT_TIMEOUT_MS:
+        connect_args['options'] = (
+            f'-c statement_timeout={settings.DATABASE_STATEMENT_TIMEOUT_MS}'
+        )
+
+    return {
+        'poolclass': InstrumentedPool,
+        'pool_size': settings.DATABASE_POOL_SIZE,
+        'max_overflow': settings.DATABASE_MAX_OVERFLOW,
+        'pool_timeout': settings.DATABASE_POOL_TIMEOUT,
+        'pool_recycle': settings.DATABASE_POOL_RECYCLE,
+        'pool_pre_ping': settings.DATABASE_POOL_PRE_PING,
+        'connect_args': connect_args,
+    }
+
+
+engines = {}
+
+
+def make_engine(name: str, url, settings: Settings):
+    new_engine = create_async_engine(url, **engine_options(settings))
+    timeout_ms = settings.DATABASE_STATEMENT_TIMEOUT_MS
+
+    if settings.DATABASE_PGBOUNCER and timeout_ms:
+
+        @event.listens_for(new_engine.sync_engine, 'begin')
+        def set_local_statement_timeout(conn):
+            conn.exec_driver_sql(
+                f'SET LOCAL statement_timeout = {int(timeout_ms)}'
+            )
+
+    profiler.install(new_engine)
+    engines[name] = new_engine
+    return new_engine
+
+
+engine = make_engine('primary', settings.DATABASE_URL, settings)
+
+
+def pool_status(engine):
+    pool = engine.pool
+    return {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': pool.overflow(),
+        'checkouts': pool.stats.checkouts,
+        'timeouts': pool.stats.timeouts,
+        'wait_seconds_total': pool.stats.wait_seconds_total,
+        'wait_seconds_max': pool.stats.wait_seconds_max,
+    }
+
+
+def is_postgres(session: AsyncSession):
+    return session.bind.dialect.name == 'postgresql'
 
 
 async def get_session():
@@ -0,0 +1,53 @@
+import csv
+import io
+import json
+import logging
+from time import perf_counter
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def encode_rows(rows, columns: list[str], export_format: str):
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+    return ''.join(
+        json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n'
+        for row in rows
+    )
+
+
+async def stream_export(
+    bind: AsyncEngine, query, export_format: str, chunk_size: int
+):
+    start = perf_counter()
+    count = 0
+
+    async with bind.connect() as conn:
+        if bind.dialect.name == 'postgresql':
+            await conn.execution_options(isolation_level='REPEATABLE READ')
+
+        result = await conn.stream(
+            query.execution_options(yield_per=chunk_size)
+        )
+        columns = list(result.keys())
+        if export_format == 'csv':
+            yield encode_rows([columns], columns, export_format)
+
+        async for rows in result.partitions():
+            count += len(rows)
+            yield encode_rows(rows, columns, export_format)
+
+    elapsed = perf_counter() - start
+    logger.info(
+        'export finished: %d rows in %.2fs (%.0f rows/s)',
+        count,
+        elapsed,
+        count / elapsed if elapsed else count,
+    )
@@ -0,0 +1,68 @@
+import hashlib
+from datetime import UTC, datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from http import HTTPStatus
+
+from fastapi import Request, Response
+
+from madr_fastapi.settings import Settings
+
+settings = Settings()
+
+
+def make_etag(*parts):
+    digest = hashlib.sha256(':'.join(map(str, parts)).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _as_utc(value: datetime):
+    if value.tzinfo is None:
+        return value.replace(tzinfo=UTC)
+    return value.astimezone(UTC)
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: datetime | None = None
+):
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match:
+        if if_none_match.strip() == '*':
+            return True
+        candidates = {
+            tag.strip().removeprefix('W/') for tag in if_none_match.split(',')
+        }
+        return etag in candidates
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+
+    return False
+
+
+def cache_headers(etag: str, last_modified: datetime | None = None):
+    headers = {'ETag': etag, 'Cache-Control': settings.HTTP_CACHE_CONTROL}
+    if last_modified:
+        headers['Last-Modified'] = format_datetime(
+            _as_utc(last_modified), usegmt=True
+        )
+    return headers
+
+
+def not_modified(etag: str, last_modified: datetime | None = None):
+    return Response(
+        status_code=HTTPStatus.NOT_MODIFIED,
+        headers=cache_headers(etag, last_modified),
+    )
+
+
+def collection_etag(name: str, rows, *extra):
+    # The rows are the ones already loaded for the body; extra covers
+    # whatever else it carries, such as the total and the next cursor,
+    # which can change while the page's rows do not.
+    versions = [(row.id, row.updated_at) for row in rows]
+    return make_etag(name, versions, *extra)
@@ -0,0 +1,64 @@
+import csv
+import json
+
+from madr_fastapi.schemas import BookSchema
+
+
+async def iter_lines(stream, max_bytes: int):
+    # Yields None in place of a line longer than max_bytes; the rest of
+    # such a line is discarded as it arrives instead of being buffered.
+    buffer = bytearray()
+    skipping = False
+    async for chunk in stream:
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b'\n', start)) != -1:
+            if skipping:
+                skipping = False
+            elif end - start > max_bytes:
+                yield None
+            else:
+                yield bytes(buffer[start:end])
+            start = end + 1
+        del buffer[:start]
+
+        if not skipping and len(buffer) > max_bytes:
+            yield None
+            skipping = True
+        if skipping:
+            buffer.clear()
+
+    if buffer and not skipping:
+        yield bytes(buffer)
+
+
+def _load_row(line: str, header: list[str] | None):
+    if header is None:
+        return json.loads(line)
+    return dict(zip(header, next(csv.reader([line]))))
+
+
+async def iter_book_rows(stream, is_csv: bool, max_line_bytes: int):
+    header = None
+    line_number = 0
+    async for raw_line in iter_lines(stream, max_line_bytes):
+        line_number += 1
+        if raw_line is None:
+            yield line_number, None, 'Row is too long'
+            continue
+
+        line = raw_line.decode('utf-8', errors='replace').strip()
+        if not line:
+            continue
+
+        if is_csv and header is None:
+            header = [value.strip() for value in next(csv.reader([line]))]
+            continue
+
+        try:
+            book = BookSchema.model_validate(_load_row(line, header))
+        except ValueError:
+            yield line_number, None, 'Invalid row'
+            continue
+
+        yield line_number, book, None
@@ -0,0 +1,247 @@
+import os
+from bisect import bisect_left
+from time import perf_counter
+
+from madr_fastapi.database import engines, pool_status
+from madr_fastapi.settings import Settings
+
+settings = Settings()
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)  # fmt: skip
+
+# Values are plain attributes updated from the event loop thread only,
+# so recording a sample needs no locks.
+registry = []
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def _format_labels(names, values, *extra):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(pair for pair in extra if pair)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _worker_label():
+    # Every worker keeps its own series; the pid keeps them apart so
+    # they can be summed instead of overwriting one another.
+    if settings.METRICS_WORKER_LABEL:
+        return f'worker="{os.getpid()}"'
+    return ''
+
+
+class CounterValue:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class GaugeValue(CounterValue):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class HistogramValue:
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Metric:
+    kind = 'untyped'
+    value_class = CounterValue
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        registry.append(self)
+
+    def _new_value(self):
+        return self.value_class()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_value()
+        return child
+
+    def _samples(self, values, child, worker):
+        labels = _format_labels(self.labelnames, values, worker)
+        yield f'{self.name}{labels} {child.value}'
+
+    def render(self):
+        worker = _worker_label()
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        for values, child in list(self._children.items()):
+            lines.extend(self._samples(values, child, worker))
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+    value_class = GaugeValue
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets=DEFAULT_BUCKETS, **kwargs):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(*args, **kwargs)
+
+    def _new_value(self):
+        return HistogramValue(self.buckets)
+
+    def _samples(self, values, child, worker):
+        cumulative = 0
+        for bound, count in zip(
+            (*self.buckets, '+Inf'), child.counts, strict=True
+        ):
+            cumulative += count
+            labels = _format_labels(
+                self.labelnames, values, worker, f'le="{bound}"'
+            )
+            yield f'{self.name}_bucket{labels} {cumulative}'
+
+        labels = _format_labels(self.labelnames, values, worker)
+        yield f'{self.name}_sum{labels} {child.sum}'
+        yield f'{self.name}_count{labels} {child.count}'
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by route.',
+    ('method', 'route'),
+)
+REQUESTS_TOTAL = Counter(
+    'http_requests_total',
+    'HTTP responses by route and status code.',
+    ('method', 'route', 'status'),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'HTTP requests being served.'
+)
+PASSWORD_HASH_DURATION = Histogram(
+    'password_hash_duration_seconds',
+    'Argon2 hash/verify time, including time queued in the hashing pool.',
+    ('operation',),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+AUTH_RESOLUTIONS = Counter(
+    'auth_principal_resolutions_total',
+    'Access tokens decoded and checked for revocation.',
+)
+DB_POOL = Gauge(
+    'db_pool', 'Database connection pool state.', ('engine', 'state')
+)
+DB_POOL_CHECKOUTS = Counter(
+    'db_pool_checkouts_total',
+    'Connections checked out of the pool.',
+    ('engine',),
+)
+DB_POOL_TIMEOUTS = Counter(
+    'db_pool_timeouts_total', 'Checkouts that timed out waiting.', ('engine',)
+)
+DB_POOL_WAIT = Counter(
+    'db_pool_wait_seconds_total',
+    'Time spent waiting for a connection.',
+    ('engine',),
+)
+
+_in_progress = REQUESTS_IN_PROGRESS.labels()
+
+
+def _collect_pool():
+    for name, engine in engines.items():
+        status = pool_status(engine)
+        for state in ('size', 'checked_out', 'checked_in', 'overflow'):
+            DB_POOL.labels(name, state).set(status[state])
+        DB_POOL_CHECKOUTS.labels(name).value = status['checkouts']
+        DB_POOL_TIMEOUTS.labels(name).value = status['timeouts']
+        DB_POOL_WAIT.labels(name).value = status['wait_seconds_total']
+
+
+def render_metrics():
+    _collect_pool()
+    return '\n'.join(metric.render() for metric in registry) + '\n'
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._bound = {}
+
+    def _children(self, method, route, status):
+        key = (method, route, status)
+        children = self._bound.get(key)
+        if children is None:
+            children = self._bound[key] = (
+                REQUEST_DURATION.labels(method, route),
+                REQUESTS_TOTAL.labels(method, route, str(status)),
+            )
+        return children
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        _in_progress.value += 1
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = perf_counter() - start
+            _in_progress.value -= 1
+            route = scope.get('route')
+            duration, total = self._children(
+                scope['method'],
+                route.path if route is not None else 'unmatched',
+                status,
+            )
+            duration.observe(elapsed)
+            total.value += 1
@@ -1,19 +1,31 @@
 from datetime import datetime
 
-from sqlalchemy import ForeignKey, func
+from sqlalchemy import DDL, ForeignKey, Index, event, func
 from sqlalchemy.orm import Mapped, mapped_column, registry, relationship
 
 table_registry = registry()
 
+event.listen(
+    table_registry.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(
+        dialect='postgresql'
+    ),
+)
+
 
 @table_registry.mapped_as_dataclass
 class User:
     __tablename__ = 'users'
+    __mapper_args__ = {'eager_defaults': True}
 
     id: Mapped[int] = mapped_column(init=False, primary_key=True)
     username: Mapped[str] = mapped_column(nullable=False, unique=True)
     email: Mapped[str] = mapped_column(nullable=False, unique=True)
     password: Mapped[str]
+    token_version: Mapped[int] = mapped_column(
+        init=False, default=0, server_default='0'
+    )
     created_at: Mapped[datetime] = mapped_column(
         init=False, server_default=func.now()
     )
@@ -25,9 +37,18 @@ class User:
 @table_registry.mapped_as_dataclass
 class Book:
     __tablename__ = 'books'
+    __mapper_args__ = {'eager_defaults': True}
+    __table_args__ = (
+        Index(
+            'ix_books_title_trgm',
+            'title',
+            postgresql_using='gin',
+            postgresql_ops={'title': 'gin_trgm_ops'},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(init=False, primary_key=True)
-    year: Mapped[int] = mapped_column(nullable=False)
+    year: Mapped[int] = mapped_column(nullable=False, index=True)
     title: Mapped[str] = mapped_column(nullable=False)
     novelist_id: Mapped[int] = mapped_column(ForeignKey('novelists.id'))
     author: Mapped['Novelist'] = relationship(
@@ -44,10 +65,22 @@ class Book:
 @table_registry.mapped_as_dataclass
 class Novelist:
     __tablename__ = 'novelists'
+    __mapper_args__ = {'eager_defaults': True}
+    __table_args__ = (
+        Index(
+            'ix_novelists_name_trgm',
+            'name',
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+        ),
+    )
+
     id: Mapped[int] = mapped_column(init=False, primary_key=True)
     name: Mapped[str] = mapped_column(nullable=False, unique=True)
     books: Mapped[list['Book']] = relationship(
-        init=False, back_populates='author', cascade='all, delete-orphan'
+        init=False,
+        back_populates='author',
+        cascade='all, delete-orphan',
     )
     created_at: Mapped[datetime] = mapped_column(
         init=False, server_default=func.now()
@@ -55,3 +88,20 @@ class Novelist:
     updated_at: Mapped[datetime] = mapped_column(
         init=False, server_default=func.now(), onupdate=func.now()
     )
+
+
+@table_registry.mapped_as_dataclass
+class RefreshToken:
+    __tablename__ = 'refresh_tokens'
+    __mapper_args__ = {'eager_defaults': True}
+
+    jti: Mapped[str] = mapped_column(primary_key=True)
+    family: Mapped[str] = mapped_column(index=True)
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey('users.id', ondelete='CASCADE'), index=True
+    )
+    expires_at: Mapped[datetime]
+    revoked: Mapped[bool] = mapped_column(default=False)
+    created_at: Mapped[datetime] = mapped_column(
+        init=False, server_default=func.now()
+    )
@@ -0,0 +1,118 @@
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from http import HTTPStatus
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from madr_fastapi.database import is_postgres
+from madr_fastapi.schemas import Page
+
+QUERY_CANCELED = '57014'
+
+
+def encode_cursor(last_id: int):
+    raw = json.dumps({'id': last_id}).encode()
+    return urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(json.loads(urlsafe_b64decode(padded))['id'])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST, detail='Invalid cursor'
+        )
+
+
+def paginate(query, id_column, page: Page, *order_by):
+    query = query.order_by(*order_by, id_column).limit(page.limit)
+    if page.cursor:
+        if order_by:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST,
+                detail='Cursor is only supported when sorting by id',
+            )
+        return query.where(id_column > decode_cursor(page.cursor))
+    return query.offset(page.offset)
+
+
+def next_cursor(rows, limit: int):
+    if limit and len(rows) == limit:
+        return encode_cursor(rows[-1].id)
+    return None
+
+
+async def _planner_rows(session: AsyncSession, query):
+    conn = await session.connection()
+    compiled = query.compile(dialect=conn.dialect)
+    result = await conn.exec_driver_sql(
+        f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params
+    )
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+async def _table_rows(session: AsyncSession, table: str):
+    # reltuples is -1 until the table has been vacuumed or analyzed.
+    estimate = await session.scalar(
+        text(
+            'SELECT reltuples::bigint FROM pg_class '
+            'WHERE oid = CAST(:table AS regclass)'
+        ),
+        {'table': table},
+    )
+    return estimate if estimate is not None and estimate >= 0 else None
+
+
+async def _bounded_count(session: AsyncSession, count_query, timeout_ms):
+    previous = await session.scalar(text('SHOW statement_timeout'))
+    await session.execute(
+        select(func.set_config('statement_timeout', str(timeout_ms), True))
+    )
+    try:
+        async with session.begin_nested():
+            return await session.scalar(count_query)
+    except DBAPIError as exc:
+        if getattr(exc.orig, 'sqlstate', None) != QUERY_CANCELED:
+            raise
+        return None
+    finally:
+        await session.execute(
+            select(func.set_config('statement_timeout', previous, True))
+        )
+
+
+async def count_total(
+    session: AsyncSession,
+    query,
+    table: str,
+    threshold: int,
+    timeout_ms: int,
+):
+    count_query = select(func.count()).select_from(
+        query.order_by(None).subquery()
+    )
+    if not is_postgres(session):
+        return await session.scalar(count_query), False
+
+    if query.whereclause is None:
+        estimate = await _table_rows(session, table)
+    else:
+        estimate = await _planner_rows(session, query)
+
+    # Large results get the planner's figure; small ones are cheap
+    # enough to count exactly, as long as the count finishes in time.
+    if estimate is not None and estimate >= threshold:
+        return estimate, True
+
+    total = await _bounded_count(session, count_query, timeout_ms)
+    if total is None:
+        return estimate or 0, True
+    return total, False
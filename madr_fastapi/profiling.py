@@ -0,0 +1,164 @@
+import logging
+from collections import Counter
+from contextvars import ContextVar
+from time import perf_counter
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+from madr_fastapi.settings import Settings
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+_current_profile: ContextVar['RequestProfile | None'] = ContextVar(
+    'sql_profile', default=None
+)
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = getattr(engine, 'sync_engine', engine)
+        self.statements: list[str] = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_statement = None
+        self.shapes: Counter[str] = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        self.shapes[' '.join(statement.split())] += 1
+        if elapsed >= self.slowest:
+            self.slowest = elapsed
+            self.slowest_statement = statement
+
+    def repeated(self, threshold: int):
+        return {
+            shape: count
+            for shape, count in self.shapes.items()
+            if count >= threshold
+        }
+
+    def server_timing(self, threshold: int):
+        entries = [
+            f'db;desc="{self.count} queries";dur={self.total * 1000:.2f}',
+            f'db-slowest;dur={self.slowest * 1000:.2f}',
+        ]
+        repeated = self.repeated(threshold)
+        if repeated:
+            entries.append(f'db-n-plus-one;desc="{max(repeated.values())}"')
+        return ', '.join(entries)
+
+
+def _before_cursor_execute(conn, cursor, statement, *args):
+    if _current_profile.get() is not None:
+        conn.info.setdefault('query_start', []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, *args):
+    profile = _current_profile.get()
+    if profile is not None and conn.info.get('query_start'):
+        start = conn.info['query_start'].pop()
+        profile.record(statement, perf_counter() - start)
+
+
+class SQLProfiler:
+    def __init__(self, enabled: bool, repeat_threshold: int):
+        self.enabled = enabled
+        self.repeat_threshold = repeat_threshold
+        self._engines = set()
+
+    def install(self, engine):
+        sync_engine = getattr(engine, 'sync_engine', engine)
+        if sync_engine in self._engines:
+            return
+
+        event.listen(
+            sync_engine, 'before_cursor_execute', _before_cursor_execute
+        )
+        event.listen(
+            sync_engine, 'after_cursor_execute', _after_cursor_execute
+        )
+        self._engines.add(sync_engine)
+
+    def report(self, scope, profile: RequestProfile):
+        repeated = profile.repeated(self.repeat_threshold)
+        logger.info(
+            'sql profile %s %s: %d queries in %.2fms',
+            scope['method'],
+            scope['path'],
+            profile.count,
+            profile.total * 1000,
+            extra={
+                'sql_profile': {
+                    'method': scope['method'],
+                    'path': scope['path'],
+                    'query_count': profile.count,
+                    'db_time_ms': profile.total * 1000,
+                    'slowest_ms': profile.slowest * 1000,
+                    'slowest_statement': profile.slowest_statement,
+                    'repeated_statements': repeated,
+                }
+            },
+        )
+        for shape, count in repeated.items():
+            logger.warning(
+                'possible N+1 in %s %s: statement ran %d times: %s',
+                scope['method'],
+                scope['path'],
+                count,
+                shape,
+            )
+
+
+profiler = SQLProfiler(
+    settings.SQL_PROFILING, settings.SQL_PROFILING_REPEAT_THRESHOLD
+)
+
+
+class SQLProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    'Server-Timing',
+                    profile.server_timing(profiler.repeat_threshold),
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_profile.reset(token)
+            profiler.report(scope, profile)
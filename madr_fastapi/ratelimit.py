@@ -0,0 +1,153 @@
+from collections import OrderedDict
+from http import HTTPStatus
+from math import ceil
+from time import monotonic, time
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import OAuth2PasswordRequestForm
+
+from madr_fastapi.cache import delete_prefix, redis_client
+from madr_fastapi.settings import Settings
+
+# Refill, spend and persist one bucket atomically on the Redis side so
+# concurrent workers cannot both take the last token.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * rate)
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+else
+    tokens = tokens - 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class MemoryBucketStore:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    async def take(self, key: str, capacity: int, rate: float):
+        now = monotonic()
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            tokens = capacity
+        else:
+            tokens, updated_at = bucket
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+
+        wait = 0.0
+        if tokens < 1:
+            wait = (1 - tokens) / rate
+        else:
+            tokens -= 1
+
+        # Evicting the least recently used bucket only forgets a client
+        # that has been quiet the longest, whose bucket is the fullest.
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def clear(self):
+        self._buckets.clear()
+
+
+class RedisBucketStore:
+    def __init__(self, client, prefix: str = 'madr:ratelimit:'):
+        self.prefix = prefix
+        self._redis = client
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def take(self, key: str, capacity: int, rate: float):
+        wait = await self._script(
+            keys=[self.prefix + key], args=[capacity, rate, time()]
+        )
+        return float(wait)
+
+    async def clear(self):
+        await delete_prefix(self._redis, self.prefix)
+
+
+def create_bucket_store(url: str | None, maxsize: int):
+    if url:
+        return RedisBucketStore(redis_client(url))
+    return MemoryBucketStore(maxsize)
+
+
+class RateLimiter:
+    def __init__(self, store, name: str, capacity: int, per_minute: int):
+        self.store = store
+        self.name = name
+        self.capacity = capacity
+        self.rate = per_minute / 60
+        self.rejected = 0
+
+    async def hit(self, key: str):
+        wait = await self.store.take(
+            f'{self.name}:{key}', self.capacity, self.rate
+        )
+        if wait > 0:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=HTTPStatus.TOO_MANY_REQUESTS,
+                detail='Too many requests, try again later',
+                headers={'Retry-After': str(ceil(wait))},
+            )
+
+
+settings = Settings()
+bucket_store = create_bucket_store(
+    settings.CACHE_URL, settings.RATE_LIMIT_MAX_KEYS
+)
+login_ip_limiter = RateLimiter(
+    bucket_store,
+    'login-ip',
+    settings.LOGIN_RATE_LIMIT_IP_CAPACITY,
+    settings.LOGIN_RATE_LIMIT_IP_PER_MINUTE,
+)
+login_user_limiter = RateLimiter(
+    bucket_store,
+    'login-user',
+    settings.LOGIN_RATE_LIMIT_USER_CAPACITY,
+    settings.LOGIN_RATE_LIMIT_USER_PER_MINUTE,
+)
+signup_ip_limiter = RateLimiter(
+    bucket_store,
+    'signup-ip',
+    settings.SIGNUP_RATE_LIMIT_CAPACITY,
+    settings.SIGNUP_RATE_LIMIT_PER_MINUTE,
+)
+
+
+def client_ip(request: Request):
+    return request.client.host if request.client else 'unknown'
+
+
+async def limit_login(
+    request: Request,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+):
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    await login_ip_limiter.hit(client_ip(request))
+    await login_user_limiter.hit(form_data.username.strip().lower())
+
+
+async def limit_signup(request: Request):
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    await signup_ip_limiter.hit(client_ip(request))
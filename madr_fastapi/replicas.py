@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from time import monotonic
+
+from fastapi import Depends, Request
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from madr_fastapi.cache import SingleFlight, create_cache_backend
+from madr_fastapi.database import get_session, make_engine
+from madr_fastapi.security import oauth2_scheme
+from madr_fastapi.settings import Settings
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+REPLICATION_LAG = text(
+    'SELECT COALESCE('
+    'EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)'
+)
+
+
+async def replication_lag(engine):
+    async with engine.connect() as conn:
+        if conn.dialect.name != 'postgresql':
+            return 0.0
+        return float(await conn.scalar(REPLICATION_LAG))
+
+
+def _client_key(token: str):
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        engines,
+        sticky_backend,
+        max_lag: float,
+        check_interval: float,
+        check_timeout: float,
+    ):
+        self.engines = list(engines)
+        self.sticky = sticky_backend
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self._health = {}
+        self._checks = SingleFlight()
+        self._next = 0
+
+    async def _check(self, index: int):
+        engine = self.engines[index]
+        try:
+            lag = await asyncio.wait_for(
+                replication_lag(engine), self.check_timeout
+            )
+        except (DBAPIError, OSError, TimeoutError):
+            logger.warning('replica %s is unreachable', engine.url.host)
+            healthy = False
+        else:
+            healthy = lag <= self.max_lag
+            if not healthy:
+                logger.warning(
+                    'replica %s is %.1fs behind', engine.url.host, lag
+                )
+
+        self._health[index] = (healthy, monotonic())
+        return healthy
+
+    async def _is_healthy(self, index: int):
+        healthy, checked_at = self._health.get(index, (False, None))
+        if checked_at is not None and (
+            monotonic() - checked_at < self.check_interval
+        ):
+            return healthy
+        return await self._checks.do(str(index), lambda: self._check(index))
+
+    def mark_down(self, engine):
+        self._health[self.engines.index(engine)] = (False, monotonic())
+
+    async def mark_write(self, token: str):
+        if self.engines:
+            await self.sticky.set(_client_key(token), '1')
+
+    async def recently_wrote(self, token: str):
+        if not self.engines:
+            return False
+        return bool(await self.sticky.get(_client_key(token)))
+
+    async def choose(self, token: str):
+        # A client that has just written reads from the primary until
+        # its change has had time to reach the replicas.
+        if await self.recently_wrote(token):
+            return None
+        return await self.pick()
+
+    async def pick(self):
+        for _ in range(len(self.engines)):
+            index = self._next % len(self.engines)
+            self._next += 1
+            if await self._is_healthy(index):
+                return self.engines[index]
+        return None
+
+
+def _replica_urls(settings: Settings):
+    urls = settings.DATABASE_REPLICA_URLS or ''
+    return [url.strip() for url in urls.split(',') if url.strip()]
+
+
+replica_router = ReplicaRouter(
+    [
+        make_engine(f'replica{index}', url, settings)
+        for index, url in enumerate(_replica_urls(settings))
+    ],
+    create_cache_backend(
+        settings.CACHE_URL,
+        settings.USER_CACHE_MAX_SIZE,
+        settings.DATABASE_READ_YOUR_WRITES_SECONDS,
+        prefix='madr:rw:',
+    ),
+    settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+    settings.DATABASE_REPLICA_CHECK_SECONDS,
+    settings.DATABASE_REPLICA_CHECK_TIMEOUT_SECONDS,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class ReadTarget:
+    engine: AsyncEngine | None = None
+    recent_write: bool = False
+
+    @property
+    def source(self):
+        if self.engine is None:
+            return 'primary'
+        return f'replica:{self.engine.url.render_as_string()}'
+
+
+async def get_read_target(token: str = Depends(oauth2_scheme)):
+    # Results shared between requests must not reach a client inside its
+    # read-your-writes window: they may have been read from a replica
+    # that has not caught up with the client's write yet.
+    if await replica_router.recently_wrote(token):
+        return ReadTarget(recent_write=True)
+    return ReadTarget(await replica_router.pick())
+
+
+async def get_read_session(
+    session: AsyncSession = Depends(get_session),
+    target: ReadTarget = Depends(get_read_target),
+):
+    if target.engine is None:
+        yield session
+        return
+
+    async with AsyncSession(target.engine, expire_on_commit=False) as replica:
+        try:
+            yield replica
+        except DBAPIError:
+            replica_router.mark_down(target.engine)
+            raise
+
+
+async def track_writes(request: Request, token: str = Depends(oauth2_scheme)):
+    yield
+    if request.method not in SAFE_METHODS:
+        await replica_router.mark_write(token)
@@ -1,25 +1,101 @@
+from datetime import datetime
 from http import HTTPStatus
 from typing import Annotated
+from zoneinfo import ZoneInfo
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Form, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy import select
+from jwt import DecodeError, ExpiredSignatureError, decode
+from sqlalchemy import delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from madr_fastapi.database import get_session
-from madr_fastapi.models import User
-from madr_fastapi.schemas import Token
+from madr_fastapi.models import RefreshToken, User
+from madr_fastapi.ratelimit import limit_login
+from madr_fastapi.schemas import Message, Token
 from madr_fastapi.security import (
     create_access_token,
-    verify_password,
+    create_refresh_token,
+    settings,
+    verify_password_async,
 )
 
 router = APIRouter(prefix='/auth', tags=['auth'])
 Session = Annotated[AsyncSession, Depends(get_session)]
 OAuth2Form = Annotated[OAuth2PasswordRequestForm, Depends()]
+RefreshTokenForm = Annotated[str, Form()]
 
 
-@router.post('/token', status_code=HTTPStatus.OK, response_model=Token)
+def _utcnow():
+    return datetime.now(tz=ZoneInfo('UTC')).replace(tzinfo=None)
+
+
+async def _issue_tokens(session: AsyncSession, user: User, family=None):
+    await session.execute(
+        delete(RefreshToken).where(
+            RefreshToken.user_id == user.id,
+            RefreshToken.expires_at < _utcnow(),
+        )
+    )
+    refresh_token, claims = create_refresh_token(
+        data={'sub': user.email}, family=family
+    )
+    session.add(
+        RefreshToken(
+            jti=claims['jti'],
+            family=claims['fam'],
+            user_id=user.id,
+            expires_at=claims['exp'].replace(tzinfo=None),
+        )
+    )
+    await session.commit()
+
+    return {
+        'access_token': create_access_token(
+            data={
+                'sub': user.email,
+                'uid': user.id,
+                'ver': user.token_version,
+            }
+        ),
+        'refresh_token': refresh_token,
+        'token_type': 'bearer',
+    }
+
+
+def _decode_refresh_token(token: str):
+    credentials_exception = HTTPException(
+        status_code=HTTPStatus.UNAUTHORIZED,
+        detail='Could not validate credentials',
+        headers={'WWW-Authenticate': 'Bearer'},
+    )
+
+    try:
+        payload = decode(token, settings.SECRET_KEY, settings.ALGORITHM)
+    except (DecodeError, ExpiredSignatureError):
+        raise credentials_exception
+
+    if payload.get('type') != 'refresh' or not payload.get('jti'):
+        raise credentials_exception
+
+    return payload, credentials_exception
+
+
+async def _revoke_family(session: AsyncSession, family: str):
+    await session.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family == family)
+        .values(revoked=True)
+    )
+    await session.commit()
+
+
+@router.post(
+    '/token',
+    status_code=HTTPStatus.OK,
+    response_model=Token,
+    dependencies=[Depends(limit_login)],
+)
 async def login(session: Session, form_data: OAuth2Form):
     user = await session.scalar(
         select(User).where(form_data.username == User.email)
@@ -31,20 +107,50 @@ async def login(session: Session, form_data: OAuth2Form):
             detail='User or credentials invalid',
         )
 
-    if not verify_password(form_data.password, user.password):
+    if not await verify_password_async(form_data.password, user.password):
         raise HTTPException(
             status_code=HTTPStatus.UNAUTHORIZED,
             detail='User or credentials invalid',
         )
 
-    token = create_access_token(data={'sub': user.email})
+    return await _issue_tokens(session, user)
+
+
+@router.post('/refresh_token', status_code=HTTPStatus.OK, response_model=Token)
+async def refresh_access_token(
+    session: Session, refresh_token: RefreshTokenForm
+):
+    payload, credentials_exception = _decode_refresh_token(refresh_token)
+
+    # Rotation: the presented token is deleted in the same statement that
+    # checks it, so two concurrent refreshes cannot both succeed and spent
+    # tokens do not pile up.
+    rotated = await session.execute(
+        delete(RefreshToken)
+        .where(
+            RefreshToken.jti == payload['jti'],
+            RefreshToken.revoked.is_(False),
+        )
+        .returning(RefreshToken.user_id)
+    )
+    user_id = rotated.scalar()
+    if user_id is None:
+        # A spent or revoked token being replayed means the family may
+        # have leaked, so nothing issued from it stays valid.
+        await _revoke_family(session, payload['fam'])
+        raise credentials_exception
+
+    user = await session.get(User, user_id)
+    if not user:
+        await session.rollback()
+        raise credentials_exception
+
+    return await _issue_tokens(session, user, family=payload['fam'])
 
-    return {'access_token': token, 'token_type': 'bearer'}
 
+@router.post('/logout', status_code=HTTPStatus.OK, response_model=Message)
+async def logout(session: Session, refresh_token: RefreshTokenForm):
+    payload, _ = _decode_refresh_token(refresh_token)
+    await _revoke_family(session, payload['fam'])
 
-# @router.post('/refresh_token', response_model=Token)
-# async def refresh_access_token(
-#     session: Session,
-#     current_user:
-# ):
-#     pass
+    return {'message': 'Logged out'}
@@ -2,21 +2,32 @@ from http import HTTPStatus
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from madr_fastapi.database import get_session
-from madr_fastapi.models import User
+from madr_fastapi.models import RefreshToken, User
+from madr_fastapi.ratelimit import limit_signup
 from madr_fastapi.schemas import Message, UserPublic, UserSchema
-from madr_fastapi.security import get_current_user, get_password_hash
+from madr_fastapi.security import (
+    get_current_user,
+    get_password_hash_async,
+    token_versions,
+    user_cache,
+)
 
 router = APIRouter(prefix='/conta', tags=['contas'])
 Session = Annotated[AsyncSession, Depends(get_session)]
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
 
-@router.post('/', status_code=HTTPStatus.CREATED, response_model=UserPublic)
+@router.post(
+    '/',
+    status_code=HTTPStatus.CREATED,
+    response_model=UserPublic,
+    dependencies=[Depends(limit_signup)],
+)
 async def create_account(session: Session, user: UserSchema):
 
     user_db = await session.scalar(
@@ -35,12 +46,11 @@ async def create_account(session: Session, user: UserSchema):
     user_db = User(
         username=user.username.lower(),
         email=user.email.lower(),
-        password=get_password_hash(user.password),
+        password=await get_password_hash_async(user.password),
     )
 
     session.add(user_db)
     await session.commit()
-    await session.refresh(user_db)
 
     return user_db
 
@@ -55,14 +65,29 @@ async def update_user(
             detail='You are not allowed to change this user',
         )
 
+    password = await get_password_hash_async(user.password)
+    # Changing credentials ends every session that was opened with the
+    # old ones; the revocation commits together with the update below.
+    # The bump happens in SQL because current_user may come from a
+    # cache holding an older version.
+    token_version = await session.scalar(
+        update(User)
+        .where(User.id == current_user.id)
+        .values(token_version=User.token_version + 1)
+        .returning(User.token_version),
+        execution_options={'synchronize_session': 'fetch'},
+    )
+    await session.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == current_user.id)
+        .values(revoked=True)
+    )
     try:
         current_user.username = user.username.strip().lower()
         current_user.email = user.email.strip().lower()
-        current_user.password = get_password_hash(user.password)
+        current_user.password = password
         session.add(current_user)
         await session.commit()
-        await session.refresh(current_user)
-        return current_user
 
     except IntegrityError:
         raise HTTPException(
@@ -70,6 +95,10 @@ async def update_user(
             detail='Username or email already exists',
         )
 
+    await user_cache.invalidate(current_user.id)
+    await token_versions.set(current_user.id, token_version)
+    return current_user
+
 
 @router.delete('/{user_id}', status_code=HTTPStatus.OK, response_model=Message)
 async def delete_user(
@@ -82,4 +111,6 @@ async def delete_user(
         )
     await session.delete(current_user)
     await session.commit()
+    await user_cache.invalidate(current_user.id)
+    await token_versions.invalidate(current_user.id)
     return {'message': 'Account deleted successfully'}
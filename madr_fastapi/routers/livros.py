@@ -1,34 +1,71 @@
+import heapq
 from http import HTTPStatus
-from typing import Annotated
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import String, cast, select
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy import String, cast, insert, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
-from madr_fastapi.database import get_session
-from madr_fastapi.models import Book, User
+from madr_fastapi.cache import catalogue_cache, lookups
+from madr_fastapi.database import get_session, is_postgres
+from madr_fastapi.exporter import MEDIA_TYPES, stream_export
+from madr_fastapi.http_cache import (
+    cache_headers,
+    collection_etag,
+    is_not_modified,
+    make_etag,
+    not_modified,
+)
+from madr_fastapi.importer import iter_book_rows
+from madr_fastapi.models import Book, Novelist
+from madr_fastapi.pagination import count_total, next_cursor, paginate
+from madr_fastapi.replicas import (
+    ReadTarget,
+    get_read_session,
+    get_read_target,
+    track_writes,
+)
 from madr_fastapi.schemas import (
     BookFilterPage,
     BookList,
     BookPublic,
     BookSchema,
     BookUpdate,
+    BookWithAuthorList,
+    ImportReport,
     Message,
 )
-from madr_fastapi.security import get_current_user
+from madr_fastapi.search import matches, relevance
+from madr_fastapi.security import get_principal
+from madr_fastapi.serialization import FastJSONResponse, dump_rows
+from madr_fastapi.settings import Settings
 
 router = APIRouter(
-    prefix='/livro', tags=['livros'], dependencies=[Depends(get_current_user)]
+    prefix='/livro',
+    tags=['livros'],
+    dependencies=[
+        Depends(get_principal),
+        Depends(track_writes, scope='function'),
+    ],
 )
 Session = Annotated[AsyncSession, Depends(get_session)]
-CurrentUser = Annotated[User, Depends(get_current_user)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
+Target = Annotated[ReadTarget, Depends(get_read_target)]
+settings = Settings()
 
 
 @router.post('/', status_code=HTTPStatus.CREATED, response_model=BookPublic)
-async def add_book(
-    session: Session, current_user: CurrentUser, book_schema: BookSchema
-):
+async def add_book(session: Session, book_schema: BookSchema):
     book = await session.scalar(
         select(Book).where(book_schema.title.strip().lower() == Book.title)
     )
@@ -46,7 +83,7 @@ async def add_book(
 
         session.add(book)
         await session.commit()
-        await session.refresh(book)
+        await catalogue_cache.invalidate('books')
         return book
 
     except IntegrityError:
@@ -56,12 +93,111 @@ async def add_book(
         )
 
 
+def _reject(report: dict, line: int, detail: str):
+    # Only the first IMPORT_MAX_ERRORS rows by line number are detailed;
+    # the rest are counted, so a file of bad rows cannot grow the report
+    # without bound.
+    report['failed'] += 1
+    error = (-line, detail)
+    if len(report['errors']) < settings.IMPORT_MAX_ERRORS:
+        heapq.heappush(report['errors'], error)
+    elif report['errors'] and error > report['errors'][0]:
+        heapq.heapreplace(report['errors'], error)
+
+
+async def _import_chunk(session: AsyncSession, chunk: list, report: dict):
+    titles = {book.title.strip().lower() for _, book in chunk}
+    novelist_ids = {book.novelist_id for _, book in chunk}
+
+    existing_titles = set(
+        await session.scalars(select(Book.title).where(Book.title.in_(titles)))
+    )
+    valid_novelist_ids = set(
+        await session.scalars(
+            select(Novelist.id).where(Novelist.id.in_(novelist_ids))
+        )
+    )
+
+    rows = []
+    for line, book in chunk:
+        title = book.title.strip().lower()
+        if title in existing_titles:
+            _reject(report, line, 'Book already created')
+        elif book.novelist_id not in valid_novelist_ids:
+            _reject(report, line, 'Novelist id is invalid')
+        else:
+            existing_titles.add(title)
+            rows.append((
+                line,
+                {
+                    'title': title,
+                    'year': book.year,
+                    'novelist_id': book.novelist_id,
+                },
+            ))
+
+    if not rows:
+        return
+
+    try:
+        await session.execute(insert(Book), [row for _, row in rows])
+        await session.commit()
+    except IntegrityError:
+        # Something changed since the checks above, such as a novelist
+        # being deleted; retry the chunk one row at a time so only the
+        # affected rows fail.
+        await session.rollback()
+        await _import_rows(session, rows, report)
+    else:
+        report['imported'] += len(rows)
+    await catalogue_cache.invalidate('books')
+
+
+async def _import_rows(session: AsyncSession, rows: list, report: dict):
+    for line, row in rows:
+        try:
+            async with session.begin_nested():
+                await session.execute(insert(Book), [row])
+        except IntegrityError:
+            _reject(report, line, 'Book could not be imported')
+        else:
+            report['imported'] += 1
+    await session.commit()
+
+
+@router.post('/import', status_code=HTTPStatus.OK, response_model=ImportReport)
+async def import_books(request: Request, session: Session):
+    is_csv = request.headers.get('content-type', '').startswith('text/csv')
+    report = {'imported': 0, 'failed': 0, 'errors': []}
+    chunk = []
+
+    rows = iter_book_rows(
+        request.stream(), is_csv, settings.IMPORT_MAX_LINE_BYTES
+    )
+    async for line, book, error in rows:
+        if error:
+            _reject(report, line, error)
+            continue
+
+        chunk.append((line, book))
+        if len(chunk) >= settings.IMPORT_CHUNK_SIZE:
+            await _import_chunk(session, chunk, report)
+            chunk = []
+
+    if chunk:
+        await _import_chunk(session, chunk, report)
+
+    report['errors'] = [
+        {'line': -line, 'detail': detail}
+        for line, detail in sorted(report['errors'], reverse=True)
+    ]
+    return report
+
+
 @router.patch(
     '/{book_id}', response_model=BookPublic, status_code=HTTPStatus.OK
 )
-async def update_book(
-    book_id: int, session: Session, current_user: CurrentUser, book: BookUpdate
-):
+async def update_book(book_id: int, session: Session, book: BookUpdate):
     book_db = await session.scalar(select(Book).where(Book.id == book_id))
     if not book_db:
         raise HTTPException(
@@ -82,15 +218,13 @@ async def update_book(
 
     session.add(book_db)
     await session.commit()
-    await session.refresh(book_db)
+    await catalogue_cache.invalidate('books')
 
     return book_db
 
 
 @router.delete('/{book_id}', response_model=Message, status_code=HTTPStatus.OK)
-async def delete_book(
-    book_id: int, session: Session, current_user: CurrentUser
-):
+async def delete_book(book_id: int, session: Session):
     book_db = await session.scalar(select(Book).where(book_id == Book.id))
     if not book_db:
         raise HTTPException(
@@ -99,42 +233,175 @@ async def delete_book(
 
     await session.delete(book_db)
     await session.commit()
+    await catalogue_cache.invalidate('books')
 
     return {'message': 'Book deleted successfully'}
 
 
+@router.get('/export', status_code=HTTPStatus.OK)
+async def export_books(
+    session: ReadSession,
+    export_format: Annotated[
+        Literal['ndjson', 'csv'], Query(alias='format')
+    ] = 'ndjson',
+):
+    query = (
+        select(
+            Book.id,
+            Book.title,
+            Book.year,
+            Book.novelist_id,
+            Novelist.name.label('novelist'),
+        )
+        .join(Book.author)
+        .order_by(Book.id)
+    )
+
+    filename = f'livros.{export_format}'
+    return StreamingResponse(
+        stream_export(
+            session.bind, query, export_format, settings.EXPORT_CHUNK_SIZE
+        ),
+        media_type=MEDIA_TYPES[export_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
+
+
+@router.get(
+    '/with-author',
+    status_code=HTTPStatus.OK,
+    response_model=BookWithAuthorList,
+)
+async def get_books_with_author(
+    session: ReadSession,
+    books_filter: Annotated[BookFilterPage, Query()],
+):
+    query, order_by = _filter_books(
+        select(Book).options(joinedload(Book.author)),
+        books_filter,
+        is_postgres(session),
+    )
+    query = paginate(query, Book.id, books_filter, *order_by)
+    books = (await session.scalars(query)).all()
+
+    cursor = None if order_by else next_cursor(books, books_filter.limit)
+
+    return {'books': books, 'next_cursor': cursor}
+
+
 @router.get('/{book_id}', status_code=HTTPStatus.OK, response_model=BookPublic)
 async def get_book_by_id(
-    book_id: int, session: Session, current_user: CurrentUser
+    book_id: int,
+    session: ReadSession,
+    target: Target,
+    request: Request,
+    response: Response,
 ):
-    book_db = await session.scalar(select(Book).where(book_id == Book.id))
+    async def load():
+        row = await session.execute(
+            select(Book.__table__).where(book_id == Book.id)
+        )
+        book = row.mappings().first()
+        return dict(book) if book else None
+
+    # Concurrent reads of the same book from the same database share one
+    # query; the result is a plain mapping so it is safe to hand to every
+    # waiting request.
+    book_db = await lookups.do(f'book:{book_id}:{target.source}', load)
     if not book_db:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail='Book id was not found'
         )
+
+    updated_at = book_db['updated_at']
+    etag = make_etag(
+        'book',
+        book_db['id'],
+        updated_at,
+        book_db['title'],
+        book_db['year'],
+        book_db['novelist_id'],
+    )
+    if is_not_modified(request, etag, updated_at):
+        return not_modified(etag, updated_at)
+
+    response.headers.update(cache_headers(etag, updated_at))
     return book_db
 
 
+def _filter_books(query, books_filter: BookFilterPage, postgres: bool):
+    order_by = ()
+    title = books_filter.title and books_filter.title.strip().lower()
+
+    if title:
+        ranked = books_filter.sort == 'relevance'
+        query = query.filter(
+            matches(Book.title, title, postgres, fuzzy=ranked)
+        )
+        if ranked:
+            order_by = relevance(Book.title, title, postgres)
+
+    if books_filter.year is not None:
+        if books_filter.year_match == 'contains':
+            query = query.filter(
+                cast(Book.year, String).contains(str(books_filter.year))
+            )
+        else:
+            query = query.filter(Book.year == books_filter.year)
+
+    if books_filter.year_from is not None:
+        query = query.filter(Book.year >= books_filter.year_from)
+
+    if books_filter.year_to is not None:
+        query = query.filter(Book.year <= books_filter.year_to)
+
+    return query, order_by
+
+
 @router.get('/', status_code=HTTPStatus.OK, response_model=BookList)
 async def get_book_by_parameters(
-    session: Session,
-    current_user: CurrentUser,
+    session: ReadSession,
+    target: Target,
     books_filter: Annotated[BookFilterPage, Query()],
+    request: Request,
 ):
-    query = select(Book)
-
-    if books_filter.title and books_filter.title.strip().lower():
-        query = query.filter(
-            Book.title.contains(books_filter.title.strip().lower())
-        )
+    filtered, order_by = _filter_books(
+        select(Book), books_filter, is_postgres(session)
+    )
+    query = paginate(filtered, Book.id, books_filter, *order_by)
 
-    if books_filter.year:
-        query = query.filter(
-            cast(Book.year, String).contains(books_filter.year)
-        )
+    async def load():
+        books = (await session.scalars(query)).all()
+        cursor = None if order_by else next_cursor(books, books_filter.limit)
+        total = estimated = None
+        if books_filter.include_total:
+            total, estimated = await count_total(
+                session,
+                filtered,
+                Book.__tablename__,
+                settings.COUNT_ESTIMATE_THRESHOLD,
+                settings.COUNT_TIMEOUT_MS,
+            )
+        etag = collection_etag('books', books, cursor, total, estimated)
+        return {
+            'etag': etag,
+            'body': {
+                'books': dump_rows(BookPublic, books),
+                'next_cursor': cursor,
+                'total': total,
+                'total_estimated': estimated,
+            },
+        }
 
-    books = await session.scalars(
-        query.limit(books_filter.limit).offset(books_filter.offset)
+    entry = await catalogue_cache.get_or_load(
+        'books',
+        books_filter.model_dump(),
+        load,
+        bypass=target.recent_write,
     )
+    if is_not_modified(request, entry['etag']):
+        return not_modified(entry['etag'])
 
-    return {'books': books.all()}
+    return FastJSONResponse(
+        entry['body'], headers=cache_headers(entry['etag'])
+    )
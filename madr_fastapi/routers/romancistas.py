@@ -1,29 +1,69 @@
 from http import HTTPStatus
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
 from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from madr_fastapi.database import get_session
-from madr_fastapi.models import Novelist, User
+from madr_fastapi.cache import catalogue_cache, lookups
+from madr_fastapi.database import get_session, is_postgres
+from madr_fastapi.http_cache import (
+    cache_headers,
+    collection_etag,
+    is_not_modified,
+    make_etag,
+    not_modified,
+)
+from madr_fastapi.models import Book, Novelist
+from madr_fastapi.pagination import count_total, next_cursor, paginate
+from madr_fastapi.replicas import (
+    ReadTarget,
+    get_read_session,
+    get_read_target,
+    track_writes,
+)
 from madr_fastapi.schemas import (
     Message,
+    NovelistBatch,
     NovelistFilterPage,
     NovelistList,
     NovelistPublic,
     NovelistSchema,
+    NovelistWithBooks,
+    Page,
 )
-from madr_fastapi.security import get_current_user
+from madr_fastapi.search import matches, relevance
+from madr_fastapi.security import get_principal
+from madr_fastapi.serialization import FastJSONResponse, dump_rows
+from madr_fastapi.settings import Settings
 
 router = APIRouter(
     prefix='/romancista',
     tags=['romancistas'],
-    dependencies=[Depends(get_current_user)],
+    dependencies=[
+        Depends(get_principal),
+        Depends(track_writes, scope='function'),
+    ],
 )
 Session = Annotated[AsyncSession, Depends(get_session)]
-CurrentUser = Annotated[User, Depends(get_current_user)]
+ReadSession = Annotated[AsyncSession, Depends(get_read_session)]
+Target = Annotated[ReadTarget, Depends(get_read_target)]
+settings = Settings()
+
+
+def _insert_novelists(session: AsyncSession, names: list[str]):
+    insert = postgresql.insert if is_postgres(session) else sqlite.insert
+    return insert(Novelist).values([{'name': name} for name in names])
 
 
 @router.post(
@@ -31,34 +71,66 @@ CurrentUser = Annotated[User, Depends(get_current_user)]
 )
 async def create_novelist(
     session: Session,
-    current_user: CurrentUser,
     novelist_schema: NovelistSchema,
 ):
     novelist_db = await session.scalar(
-        select(Novelist).where(
-            Novelist.name == novelist_schema.name.strip().lower()
-        )
+        _insert_novelists(session, [novelist_schema.name.strip().lower()])
+        .on_conflict_do_nothing(index_elements=['name'])
+        .returning(Novelist)
     )
-    if novelist_db:
+    if not novelist_db:
         raise HTTPException(
             status_code=HTTPStatus.CONFLICT, detail='Novelist already exists'
         )
 
-    novelist_db = Novelist(name=novelist_schema.name.strip().lower())
-    session.add(novelist_db)
     await session.commit()
-    await session.refresh(novelist_db)
+    await catalogue_cache.invalidate('novelists')
 
     return novelist_db
 
 
+@router.post('/batch', status_code=HTTPStatus.OK, response_model=NovelistBatch)
+async def create_novelists_batch(
+    session: Session,
+    novelists_schema: Annotated[
+        list[NovelistSchema],
+        Body(max_length=settings.NOVELIST_BATCH_MAX_SIZE),
+    ],
+):
+    names = list(
+        dict.fromkeys(n.name.strip().lower() for n in novelists_schema)
+    )
+    if not names:
+        return {'created': [], 'existing': []}
+
+    # DO NOTHING returns only the rows this statement inserted; the
+    # names that were already taken are looked up afterwards.
+    created = await session.execute(
+        _insert_novelists(session, names)
+        .on_conflict_do_nothing(index_elements=['name'])
+        .returning(Novelist.id, Novelist.name)
+    )
+    created = created.all()
+    created_names = {row.name for row in created}
+    existing = await session.execute(
+        select(Novelist.id, Novelist.name).where(
+            Novelist.name.in_(set(names) - created_names)
+        )
+    )
+    existing = existing.all()
+
+    await session.commit()
+    await catalogue_cache.invalidate('novelists')
+
+    return {'created': created, 'existing': existing}
+
+
 @router.delete(
     '/{novelist_id}', status_code=HTTPStatus.OK, response_model=Message
 )
 async def delete_novelist(
     novelist_id: int,
     session: Session,
-    current_user: CurrentUser,
 ):
     # deletar o romancista pelo id:
     novelist_db = await session.scalar(
@@ -71,6 +143,7 @@ async def delete_novelist(
 
     await session.delete(novelist_db)
     await session.commit()
+    await catalogue_cache.invalidate('novelists', 'books')
 
     return {'message': 'Novelist deleted in the MADR'}
 
@@ -81,7 +154,6 @@ async def delete_novelist(
 async def update_novelist(
     novelist_id: int,
     session: Session,
-    current_user: CurrentUser,
     novelist: NovelistSchema,
 ):
     novelist_db = await session.scalar(
@@ -96,7 +168,7 @@ async def update_novelist(
         novelist_db.name = novelist.name.strip().lower()
         session.add(novelist_db)
         await session.commit()
-        await session.refresh(novelist_db)
+        await catalogue_cache.invalidate('novelists')
 
         return novelist_db
 
@@ -108,10 +180,14 @@ async def update_novelist(
 
 
 @router.get(
-    '/{novelist_id}', status_code=HTTPStatus.OK, response_model=NovelistPublic
+    '/{novelist_id}/books',
+    status_code=HTTPStatus.OK,
+    response_model=NovelistWithBooks,
 )
-async def get_novelist_by_id(
-    novelist_id: int, session: Session, current_user: CurrentUser
+async def get_novelist_with_books(
+    novelist_id: int,
+    session: ReadSession,
+    page: Annotated[Page, Query()],
 ):
     novelist_db = await session.scalar(
         select(Novelist).where(novelist_id == Novelist.id)
@@ -121,21 +197,111 @@ async def get_novelist_by_id(
             status_code=HTTPStatus.NOT_FOUND, detail='Novelist id not found'
         )
 
+    query = select(Book).where(Book.novelist_id == novelist_id)
+    books = (await session.scalars(paginate(query, Book.id, page))).all()
+
+    return {
+        'id': novelist_db.id,
+        'name': novelist_db.name,
+        'books': books,
+        'next_cursor': next_cursor(books, page.limit),
+    }
+
+
+@router.get(
+    '/{novelist_id}', status_code=HTTPStatus.OK, response_model=NovelistPublic
+)
+async def get_novelist_by_id(
+    novelist_id: int,
+    session: ReadSession,
+    target: Target,
+    request: Request,
+    response: Response,
+):
+    async def load():
+        row = await session.execute(
+            select(Novelist.__table__).where(novelist_id == Novelist.id)
+        )
+        novelist = row.mappings().first()
+        return dict(novelist) if novelist else None
+
+    novelist_db = await lookups.do(
+        f'novelist:{novelist_id}:{target.source}', load
+    )
+    if not novelist_db:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail='Novelist id not found'
+        )
+
+    updated_at = novelist_db['updated_at']
+    etag = make_etag(
+        'novelist', novelist_db['id'], updated_at, novelist_db['name']
+    )
+    if is_not_modified(request, etag, updated_at):
+        return not_modified(etag, updated_at)
+
+    response.headers.update(cache_headers(etag, updated_at))
     return novelist_db
 
 
 @router.get('/', status_code=HTTPStatus.OK, response_model=NovelistList)
 async def get_novelists_by_parameters(
-    session: Session,
+    session: ReadSession,
+    target: Target,
     novelist_filter: Annotated[NovelistFilterPage, Query()],
-    current_user: CurrentUser,
+    request: Request,
 ):
     query = select(Novelist)
+    order_by = ()
+    postgres = is_postgres(session)
+
     if novelist_filter.name:
-        query = query.filter(Novelist.name.contains(novelist_filter.name))
+        ranked = novelist_filter.sort == 'relevance'
+        query = query.filter(
+            matches(Novelist.name, novelist_filter.name, postgres, ranked)
+        )
+        if ranked:
+            order_by = relevance(Novelist.name, novelist_filter.name, postgres)
+
+    filtered = query
+    query = paginate(filtered, Novelist.id, novelist_filter, *order_by)
+
+    async def load():
+        novelists = (await session.scalars(query)).all()
+        cursor = (
+            None if order_by else next_cursor(novelists, novelist_filter.limit)
+        )
+        total = estimated = None
+        if novelist_filter.include_total:
+            total, estimated = await count_total(
+                session,
+                filtered,
+                Novelist.__tablename__,
+                settings.COUNT_ESTIMATE_THRESHOLD,
+                settings.COUNT_TIMEOUT_MS,
+            )
+        etag = collection_etag(
+            'novelists', novelists, cursor, total, estimated
+        )
+        return {
+            'etag': etag,
+            'body': {
+                'novelists': dump_rows(NovelistPublic, novelists),
+                'next_cursor': cursor,
+                'total': total,
+                'total_estimated': estimated,
+            },
+        }
 
-    novelists = await session.scalars(
-        query.offset(novelist_filter.offset).limit(novelist_filter.limit)
+    entry = await catalogue_cache.get_or_load(
+        'novelists',
+        novelist_filter.model_dump(),
+        load,
+        bypass=target.recent_write,
     )
+    if is_not_modified(request, entry['etag']):
+        return not_modified(entry['etag'])
 
-    return {'novelists': novelists.all()}
+    return FastJSONResponse(
+        entry['body'], headers=cache_headers(entry['etag'])
+    )
@@ -1,5 +1,11 @@
+from typing import Literal
+
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
 
+from madr_fastapi.settings import Settings
+
+settings = Settings()
+
 
 class Message(BaseModel):
     message: str
@@ -24,6 +30,7 @@ class UsersList(BaseModel):
 class Token(BaseModel):
     token_type: str
     access_token: str
+    refresh_token: str | None = None
 
 
 class BookSchema(BaseModel):
@@ -41,6 +48,20 @@ class BookPublic(BaseModel):
 
 class BookList(BaseModel):
     books: list[BookPublic]
+    next_cursor: str | None = None
+    total: int | None = None
+    total_estimated: bool | None = None
+
+
+class ImportRowError(BaseModel):
+    line: int
+    detail: str
+
+
+class ImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: list[ImportRowError]
 
 
 class BookUpdate(BaseModel):
@@ -58,13 +79,41 @@ class NovelistPublic(NovelistSchema):
     model_config = ConfigDict(from_attributes=True)
 
 
+class NovelistBatch(BaseModel):
+    created: list[NovelistPublic]
+    existing: list[NovelistPublic]
+
+
+class NovelistWithBooks(NovelistPublic):
+    books: list[BookPublic]
+    next_cursor: str | None = None
+
+
+class BookWithAuthor(BookPublic):
+    author: NovelistPublic
+
+
+class BookWithAuthorList(BaseModel):
+    books: list[BookWithAuthor]
+    next_cursor: str | None = None
+
+
 class NovelistList(BaseModel):
     novelists: list[NovelistPublic]
+    next_cursor: str | None = None
+    total: int | None = None
+    total_estimated: bool | None = None
 
 
-class FilterPage(BaseModel):
+class Page(BaseModel):
     offset: int = Field(ge=0, default=0)
-    limit: int = Field(ge=0, default=20)
+    limit: int = Field(ge=0, le=settings.MAX_PAGE_SIZE, default=20)
+    cursor: str | None = None
+
+
+class FilterPage(Page):
+    sort: Literal['id', 'relevance'] = 'id'
+    include_total: bool = False
 
 
 class NovelistFilterPage(FilterPage):
@@ -74,3 +123,6 @@ class NovelistFilterPage(FilterPage):
 class BookFilterPage(FilterPage):
     title: str | None = None
     year: int | None = None
+    year_from: int | None = None
+    year_to: int | None = None
+    year_match: Literal['exact', 'contains'] = 'exact'
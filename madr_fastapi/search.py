@@ -0,0 +1,16 @@
+from sqlalchemy import case, func, or_
+
+
+def matches(column, term: str, postgres: bool, fuzzy: bool = False):
+    if postgres and fuzzy:
+        return or_(column.contains(term), column.op('%')(term))
+    return column.contains(term)
+
+
+def relevance(column, term: str, postgres: bool):
+    if postgres:
+        return (func.similarity(column, term).desc(),)
+    return (
+        case((column == term, 0), (column.startswith(term), 1), else_=2),
+        func.length(column),
+    )
@@ -1,5 +1,10 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from http import HTTPStatus
+from time import perf_counter
+from uuid import uuid4
 from zoneinfo import ZoneInfo
 
 from fastapi import Depends, HTTPException
@@ -9,7 +14,13 @@ from pwdlib import PasswordHash
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from madr_fastapi.cache import (
+    TokenVersionCache,
+    UserCache,
+    create_cache_backend,
+)
 from madr_fastapi.database import get_session
+from madr_fastapi.metrics import AUTH_RESOLUTIONS, PASSWORD_HASH_DURATION
 from madr_fastapi.models import User
 from madr_fastapi.settings import Settings
 
@@ -18,6 +29,27 @@ settings = Settings()
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl='auth/token', refreshUrl='auth/refresh_token'
 )
+user_cache = UserCache(
+    create_cache_backend(
+        settings.CACHE_URL,
+        settings.USER_CACHE_MAX_SIZE,
+        settings.USER_CACHE_TTL_SECONDS,
+        prefix='madr:users:',
+    )
+)
+# Revocation must reach every worker. Only a shared cache is told about
+# a new version; a per-process one has to rediscover it from the
+# database, so it may only serve a version for a moment.
+token_versions = TokenVersionCache(
+    create_cache_backend(
+        settings.CACHE_URL,
+        settings.USER_CACHE_MAX_SIZE,
+        settings.USER_CACHE_TTL_SECONDS
+        if settings.CACHE_URL
+        else settings.TOKEN_VERSION_LOCAL_TTL_SECONDS,
+        prefix='madr:tokens:',
+    )
+)
 
 
 def get_password_hash(password: str):
@@ -28,6 +60,84 @@ def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class HashingPool:
+    def __init__(self, workers: int, max_pending: int, kind: str = 'thread'):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.kind = kind
+        self.pending = 0
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            executor_class = (
+                ProcessPoolExecutor
+                if self.kind == 'process'
+                else ThreadPoolExecutor
+            )
+            self._executor = executor_class(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                detail='Server is busy, try again later',
+                headers={'Retry-After': '1'},
+            )
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), func, *args
+            )
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool(
+    settings.PASSWORD_HASH_WORKERS,
+    settings.PASSWORD_HASH_MAX_PENDING,
+    settings.PASSWORD_HASH_EXECUTOR,
+)
+
+
+_hash_duration = PASSWORD_HASH_DURATION.labels('hash')
+_verify_duration = PASSWORD_HASH_DURATION.labels('verify')
+_auth_resolutions = AUTH_RESOLUTIONS.labels()
+
+
+async def get_password_hash_async(password: str):
+    start = perf_counter()
+    try:
+        return await hashing_pool.run(get_password_hash, password)
+    finally:
+        _hash_duration.observe(perf_counter() - start)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    start = perf_counter()
+    try:
+        return await hashing_pool.run(
+            verify_password, plain_password, hashed_password
+        )
+    finally:
+        _verify_duration.observe(perf_counter() - start)
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    id: int
+    email: str
+    token_version: int
+
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(tz=ZoneInfo('UTC')) + timedelta(
@@ -38,21 +148,48 @@ def create_access_token(data: dict):
     return token
 
 
-async def get_current_user(
-    session: AsyncSession = Depends(get_session),
-    token: str = Depends(oauth2_scheme),
-):
-    credentials_exception = HTTPException(
+def create_refresh_token(data: dict, family: str | None = None):
+    jti = uuid4().hex
+    expire = datetime.now(tz=ZoneInfo('UTC')) + timedelta(
+        minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES
+    )
+    claims = data | {
+        'type': 'refresh',
+        'jti': jti,
+        'fam': family or jti,
+        'exp': expire,
+    }
+    token = encode(claims, settings.SECRET_KEY, settings.ALGORITHM)
+    return token, claims
+
+
+def _credentials_exception():
+    return HTTPException(
         status_code=HTTPStatus.UNAUTHORIZED,
         detail='Could not validate credentials',
         headers={'WWW-Authenticate': 'Bearer'},
     )
 
+
+async def get_principal(
+    session: AsyncSession = Depends(get_session),
+    token: str = Depends(oauth2_scheme),
+):
+    credentials_exception = _credentials_exception()
+    _auth_resolutions.inc()
+
     try:
         payload = decode(token, settings.SECRET_KEY, settings.ALGORITHM)
-        subject_email = payload.get('sub')
-        if not subject_email:
+        if payload.get('type') == 'refresh':
             raise credentials_exception
+        principal = Principal(
+            id=int(payload['uid']),
+            email=payload['sub'],
+            token_version=int(payload['ver']),
+        )
+
+    except (KeyError, TypeError, ValueError):
+        raise credentials_exception
 
     except DecodeError:
         raise credentials_exception
@@ -60,10 +197,37 @@ async def get_current_user(
     except ExpiredSignatureError:
         raise credentials_exception
 
-    user = await session.scalar(
-        select(User).where(User.email == subject_email)
-    )
-    if not user:
+    # The only state a valid signature cannot vouch for is revocation,
+    # and that is one integer per user, normally served from the cache.
+    version = await token_versions.get(principal.id)
+    if version is None:
+        version = await session.scalar(
+            select(User.token_version).where(User.id == principal.id)
+        )
+        if version is None:
+            raise credentials_exception
+        await token_versions.set(principal.id, version)
+
+    if version != principal.token_version:
         raise credentials_exception
 
+    return principal
+
+
+async def get_current_user(
+    session: AsyncSession = Depends(get_session),
+    token: str = Depends(oauth2_scheme),
+):
+    principal = await get_principal(session, token)
+
+    cached_user = await user_cache.get(principal.id)
+    if cached_user:
+        return await session.merge(cached_user, load=False)
+
+    user = await session.get(User, principal.id)
+    if not user:
+        raise _credentials_exception()
+
+    await user_cache.set(principal.id, user)
+
     return user
@@ -0,0 +1,15 @@
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:  # noqa: PLR6301
+        return orjson.dumps(content)
+
+
+def dump_rows(model: type[BaseModel], rows):
+    # Rows come straight from our own tables, so copying the public
+    # fields is enough; validating them again would only cost CPU.
+    fields = tuple(model.model_fields)
+    return [{field: getattr(row, field) for field in fields} for row in rows]
@@ -0,0 +1,224 @@
+import argparse
+import logging
+import math
+import multiprocessing
+import os
+import signal
+import time
+from pathlib import Path
+
+import uvicorn
+
+from madr_fastapi.settings import Settings
+
+APP = 'madr_fastapi.app:app'
+CGROUP = Path('/sys/fs/cgroup')
+
+logger = logging.getLogger('uvicorn.error')
+
+
+def _cgroup_cpu_quota():
+    try:
+        quota, period = (CGROUP / 'cpu.max').read_text().split()
+    except (OSError, ValueError):
+        pass
+    else:
+        return None if quota == 'max' else int(quota) / int(period)
+
+    try:
+        quota = int((CGROUP / 'cpu' / 'cpu.cfs_quota_us').read_text())
+        period = int((CGROUP / 'cpu' / 'cpu.cfs_period_us').read_text())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 else None
+
+
+def cpu_limit():
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    # Inside a container the affinity mask is the host's; the CPU quota
+    # is what the container may actually use.
+    quota = _cgroup_cpu_quota()
+    if quota:
+        cpus = min(cpus, math.ceil(quota))
+    return max(cpus, 1)
+
+
+def default_workers(settings: Settings):
+    # Caches, rate-limit buckets, token versions and read-your-writes
+    # stickiness live in each process unless CACHE_URL points at a
+    # shared store, so without one a single worker is the safe default.
+    if not settings.CACHE_URL:
+        return 1
+    return min(cpu_limit(), settings.SERVER_MAX_WORKERS)
+
+
+def parse_args(argv=None):
+    settings = Settings()
+    parser = argparse.ArgumentParser(prog='python -m madr_fastapi.server')
+    parser.add_argument('--host', default=settings.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=settings.SERVER_PORT)
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=settings.WEB_CONCURRENCY or default_workers(settings),
+    )
+    parser.add_argument(
+        '--allow-per-process-state',
+        action=argparse.BooleanOptionalAction,
+        default=settings.SERVER_ALLOW_PER_PROCESS_STATE,
+        help='run several workers without CACHE_URL',
+    )
+    parser.add_argument(
+        '--preload',
+        action=argparse.BooleanOptionalAction,
+        default=settings.SERVER_PRELOAD,
+        help='import the app once and fork workers from it',
+    )
+    parser.add_argument(
+        '--graceful-timeout',
+        type=int,
+        default=settings.SERVER_GRACEFUL_TIMEOUT,
+    )
+    parser.add_argument(
+        '--keepalive-timeout',
+        type=int,
+        default=settings.SERVER_KEEPALIVE_TIMEOUT,
+    )
+    parser.add_argument(
+        '--forwarded-allow-ips', default=settings.FORWARDED_ALLOW_IPS
+    )
+    parser.add_argument(
+        '--access-log', action=argparse.BooleanOptionalAction, default=True
+    )
+    args = parser.parse_args(argv)
+
+    if args.workers > 1 and not settings.CACHE_URL:
+        if not args.allow_per_process_state:
+            parser.error(
+                'more than one worker needs CACHE_URL; without it caches, '
+                'rate limits and token revocation are per worker'
+            )
+        logger.warning(
+            'Running %d workers without CACHE_URL: caches, rate limits and '
+            'token revocation are per worker',
+            args.workers,
+        )
+    return args
+
+
+def server_config(args, app=APP):
+    return uvicorn.Config(
+        app,
+        host=args.host,
+        port=args.port,
+        lifespan='on',
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        timeout_keep_alive=args.keepalive_timeout,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        access_log=args.access_log,
+    )
+
+
+def run_worker(config: uvicorn.Config, sock):
+    # Spawned workers start from a fresh interpreter without the
+    # logging setup the parent did while building the config.
+    config.configure_logging()
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    def __init__(self, config: uvicorn.Config, workers: int, context):
+        self.config = config
+        self.workers = workers
+        self.context = context
+        self.processes = []
+        self.should_exit = False
+
+    def _spawn(self, sock):
+        process = self.context.Process(
+            target=run_worker, args=(self.config, sock)
+        )
+        process.start()
+        return process
+
+    def _handle_exit(self, signum, frame):
+        self.should_exit = True
+
+    def run(self):
+        sock = self.config.bind_socket()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self._handle_exit)
+
+        self.processes = [self._spawn(sock) for _ in range(self.workers)]
+        logger.info('Started %d workers', self.workers)
+
+        while not self.should_exit:
+            for index, process in enumerate(self.processes):
+                if not process.is_alive() and not self.should_exit:
+                    logger.warning(
+                        'Worker %s exited with %s, restarting',
+                        process.pid,
+                        process.exitcode,
+                    )
+                    self.processes[index] = self._spawn(sock)
+            time.sleep(0.5)
+
+        self.shutdown()
+        sock.close()
+
+    def shutdown(self):
+        # Each worker stops accepting, drains in-flight requests for up
+        # to the graceful timeout and then runs the lifespan shutdown,
+        # which disposes the database engines.
+        for process in self.processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+        deadline = (
+            time.monotonic() + (self.config.timeout_graceful_shutdown or 0) + 5
+        )
+        for process in self.processes:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning('Worker %s did not stop, killing', process.pid)
+                process.kill()
+                process.join()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.workers <= 1:
+        uvicorn.Server(server_config(args)).run()
+        return
+
+    # /metrics and the pool status describe the worker that answers the
+    # scrape; labelling each series with its pid keeps the workers'
+    # series apart. Set before the app is imported so spawned and forked
+    # workers both see it.
+    os.environ['METRICS_WORKER_LABEL'] = 'true'
+
+    if args.preload and 'fork' in multiprocessing.get_all_start_methods():
+        # Importing the app pulls in FastAPI, SQLAlchemy, pydantic and
+        # argon2; doing it once here lets every forked worker share the
+        # loaded modules instead of importing them again. Nothing in the
+        # import opens a database connection, so the pools start empty.
+        from madr_fastapi.app import app  # noqa: PLC0415
+
+        config = server_config(args, app)
+        config.load()
+        context = multiprocessing.get_context('fork')
+    else:
+        config = server_config(args)
+        context = multiprocessing.get_context('spawn')
+
+    Supervisor(config, args.workers, context).run()
+
+
+if __name__ == '__main__':
+    main()
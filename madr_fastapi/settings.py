@@ -9,3 +9,55 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    CACHE_URL: str | None = None
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 10_000
+    TOKEN_VERSION_LOCAL_TTL_SECONDS: float = 1
+    PASSWORD_HASH_EXECUTOR: str = 'thread'
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: float = 30
+    DATABASE_POOL_RECYCLE: int = -1
+    DATABASE_POOL_PRE_PING: bool = False
+    DATABASE_STATEMENT_TIMEOUT_MS: int | None = None
+    DATABASE_PGBOUNCER: bool = False
+    IMPORT_CHUNK_SIZE: int = 1000
+    IMPORT_MAX_ERRORS: int = 1000
+    IMPORT_MAX_LINE_BYTES: int = 64 * 1024
+    NOVELIST_BATCH_MAX_SIZE: int = 1000
+    EXPORT_CHUNK_SIZE: int = 1000
+    METRICS_WORKER_LABEL: bool = False
+    SQL_PROFILING: bool = False
+    SQL_PROFILING_REPEAT_THRESHOLD: int = 5
+    HTTP_CACHE_CONTROL: str = 'private, no-cache'
+    CATALOGUE_CACHE_TTL_SECONDS: int = 30
+    CATALOGUE_CACHE_MAX_SIZE: int = 1000
+    SINGLE_FLIGHT_MAX_KEYS: int = 10_000
+    MAX_PAGE_SIZE: int = 100
+    COUNT_ESTIMATE_THRESHOLD: int = 10_000
+    COUNT_TIMEOUT_MS: int = 250
+    REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+    LOGIN_RATE_LIMIT_IP_CAPACITY: int = 30
+    LOGIN_RATE_LIMIT_IP_PER_MINUTE: int = 30
+    LOGIN_RATE_LIMIT_USER_CAPACITY: int = 10
+    LOGIN_RATE_LIMIT_USER_PER_MINUTE: int = 5
+    SIGNUP_RATE_LIMIT_CAPACITY: int = 5
+    SIGNUP_RATE_LIMIT_PER_MINUTE: int = 2
+    DATABASE_REPLICA_URLS: str | None = None
+    DATABASE_REPLICA_MAX_LAG_SECONDS: float = 5
+    DATABASE_REPLICA_CHECK_SECONDS: float = 5
+    DATABASE_REPLICA_CHECK_TIMEOUT_SECONDS: float = 1
+    DATABASE_READ_YOUR_WRITES_SECONDS: float = 5
+    WEB_CONCURRENCY: int | None = None
+    SERVER_MAX_WORKERS: int = 8
+    SERVER_ALLOW_PER_PROCESS_STATE: bool = False
+    SERVER_HOST: str = '0.0.0.0'
+    SERVER_PORT: int = 8000
+    SERVER_PRELOAD: bool = True
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+    SERVER_KEEPALIVE_TIMEOUT: int = 5
+    FORWARDED_ALLOW_IPS: str = '127.0.0.1'
@@ -2,13 +2,20 @@ import factory
 import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from testcontainers.postgres import PostgresContainer
 
 from madr_fastapi.app import app
+from madr_fastapi.cache import catalogue_cache
 from madr_fastapi.database import get_session
 from madr_fastapi.models import Book, Novelist, User, table_registry
-from madr_fastapi.security import get_password_hash
+from madr_fastapi.ratelimit import bucket_store
+from madr_fastapi.security import (
+    get_password_hash,
+    token_versions,
+    user_cache,
+)
 from madr_fastapi.settings import Settings
 
 
@@ -55,11 +62,32 @@ def engine():
         yield create_async_engine(postgres.get_connection_url())
 
 
+@pytest_asyncio.fixture
+async def replica_engine(engine):
+    async with engine.connect() as conn:
+        autocommit = await conn.execution_options(isolation_level='AUTOCOMMIT')
+        await autocommit.execute(text('DROP DATABASE IF EXISTS replica'))
+        await autocommit.execute(text('CREATE DATABASE replica'))
+
+    replica = create_async_engine(engine.url.set(database='replica'))
+    async with replica.begin() as conn:
+        await conn.run_sync(table_registry.metadata.create_all)
+
+    yield replica
+
+    await replica.dispose()
+
+
 @pytest_asyncio.fixture
 async def session(engine):
     async with engine.begin() as conn:
         await conn.run_sync(table_registry.metadata.create_all)
 
+    await user_cache.clear()
+    await token_versions.clear()
+    await catalogue_cache.clear()
+    await bucket_store.clear()
+
     async with AsyncSession(engine, expire_on_commit=False) as session:
         yield session
 
@@ -1,5 +1,13 @@
+from datetime import datetime
 from http import HTTPStatus
 
+import pytest
+from jwt import decode
+from sqlalchemy import select
+
+from madr_fastapi.metrics import PASSWORD_HASH_DURATION
+from madr_fastapi.models import RefreshToken
+
 
 def test_unauthorized_login_for_token_no_user(client, user):
     response = client.post(
@@ -19,3 +27,149 @@ def test_unauthorized_login_for_token_password_not_verified(client, user):
 
     assert response.status_code == HTTPStatus.UNAUTHORIZED
     assert response.json() == {'detail': 'User or credentials invalid'}
+
+
+verify_duration = PASSWORD_HASH_DURATION.labels('verify')
+
+
+def _login(client, user):
+    return client.post(
+        '/auth/token',
+        data={'username': user.email, 'password': user.clean_password},
+    ).json()
+
+
+def test_login_returns_refresh_token(client, user):
+    tokens = _login(client, user)
+
+    assert tokens['token_type'] == 'bearer'
+    assert tokens['access_token']
+    assert tokens['refresh_token']
+
+
+def test_refresh_token_rotates_without_password_check(client, user):
+    tokens = _login(client, user)
+    verifications = verify_duration.count
+
+    response = client.post(
+        '/auth/refresh_token',
+        data={'refresh_token': tokens['refresh_token']},
+    )
+
+    refreshed = response.json()
+    assert response.status_code == HTTPStatus.OK
+    assert refreshed['refresh_token'] != tokens['refresh_token']
+    assert verify_duration.count == verifications
+    assert (
+        client.get(
+            '/romancista/',
+            headers={'Authorization': f'Bearer {refreshed["access_token"]}'},
+        ).status_code
+        == HTTPStatus.OK
+    )
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_rotation_prunes_spent_and_expired_rows(
+    client, session, user, settings
+):
+    tokens = _login(client, user)
+    session.add(
+        RefreshToken(
+            jti='expired',
+            family='expired',
+            user_id=user.id,
+            expires_at=datetime(2000, 1, 1),
+        )
+    )
+    await session.commit()
+
+    rotated = client.post(
+        '/auth/refresh_token',
+        data={'refresh_token': tokens['refresh_token']},
+    ).json()
+
+    claims = decode(
+        rotated['refresh_token'], settings.SECRET_KEY, settings.ALGORITHM
+    )
+    remaining = await session.scalars(
+        select(RefreshToken.jti).where(RefreshToken.family == claims['fam'])
+    )
+    assert remaining.all() == [claims['jti']]
+    assert not await session.get(RefreshToken, 'expired')
+
+
+def test_refresh_token_reuse_revokes_family(client, user):
+    tokens = _login(client, user)
+    rotated = client.post(
+        '/auth/refresh_token',
+        data={'refresh_token': tokens['refresh_token']},
+    ).json()
+
+    replay = client.post(
+        '/auth/refresh_token',
+        data={'refresh_token': tokens['refresh_token']},
+    )
+    after_replay = client.post(
+        '/auth/refresh_token',
+        data={'refresh_token': rotated['refresh_token']},
+    )
+
+    assert replay.status_code == HTTPStatus.UNAUTHORIZED
+    assert after_replay.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_logout_revokes_refresh_token(client, user):
+    tokens = _login(client, user)
+
+    response = client.post(
+        '/auth/logout', data={'refresh_token': tokens['refresh_token']}
+    )
+    refresh = client.post(
+        '/auth/refresh_token',
+        data={'refresh_token': tokens['refresh_token']},
+    )
+
+    assert response.json() == {'message': 'Logged out'}
+    assert refresh.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_refresh_token_is_not_an_access_token(client, user):
+    tokens = _login(client, user)
+
+    response = client.get(
+        '/romancista/',
+        headers={'Authorization': f'Bearer {tokens["refresh_token"]}'},
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_access_token_is_not_a_refresh_token(client, user):
+    tokens = _login(client, user)
+
+    response = client.post(
+        '/auth/refresh_token', data={'refresh_token': tokens['access_token']}
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_password_change_revokes_refresh_tokens(client, user):
+    tokens = _login(client, user)
+
+    client.put(
+        f'/conta/{user.id}',
+        headers={'Authorization': f'Bearer {tokens["access_token"]}'},
+        json={
+            'username': user.username,
+            'email': user.email,
+            'password': 'new secret',
+        },
+    )
+    response = client.post(
+        '/auth/refresh_token',
+        data={'refresh_token': tokens['refresh_token']},
+    )
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
@@ -0,0 +1,195 @@
+import asyncio
+
+import pytest
+
+from madr_fastapi.cache import (
+    MemoryCacheBackend,
+    RedisCacheBackend,
+    ResponseCache,
+    SingleFlight,
+    UserCache,
+)
+from tests.conftest import UserFactory
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryCacheBackend(maxsize=2, ttl=60)
+    await backend.set('a', '1')
+    await backend.set('b', '2')
+    await backend.get('a')
+    await backend.set('c', '3')
+
+    assert await backend.get('a') == '1'
+    assert await backend.get('b') is None
+    assert await backend.get('c') == '3'
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_expires_entries():
+    backend = MemoryCacheBackend(maxsize=2, ttl=0)
+    await backend.set('a', '1')
+
+    assert await backend.get('a') is None
+    assert len(backend) == 0
+
+
+@pytest.mark.asyncio
+async def test_user_cache_counts_hits_and_misses():
+    cache = UserCache(MemoryCacheBackend(maxsize=10, ttl=60))
+    user = UserFactory()
+    user.id = 1
+
+    assert await cache.get(user.email) is None
+    await cache.set(user.email, user)
+    cached = await cache.get(user.email)
+
+    assert cached.id == user.id
+    assert cached.email == user.email
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    await cache.invalidate(user.email)
+    assert await cache.get(user.email) is None
+
+
+@pytest.mark.asyncio
+async def test_user_cache_does_not_store_password_hash():
+    backend = MemoryCacheBackend(maxsize=10, ttl=60)
+    cache = UserCache(backend)
+    user = UserFactory()
+    user.id = 1
+
+    await cache.set(user.id, user)
+
+    assert user.password not in await backend.get('user:1')
+    assert 'password' not in await backend.get('user:1')
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value.encode()
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+    async def scan_iter(self, match):
+        for key in list(self.data):
+            if key.startswith(match.rstrip('*')):
+                yield key
+
+
+@pytest.mark.asyncio
+async def test_response_cache_invalidates_namespace():
+    cache = ResponseCache(RedisCacheBackend(FakeRedis(), ttl=60))
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return {'books': len(calls)}
+
+    first = await cache.get_or_load('books', {'limit': 20}, load)
+    cached = await cache.get_or_load('books', {'limit': 20}, load)
+    await cache.invalidate('books')
+    reloaded = await cache.get_or_load('books', {'limit': 20}, load)
+
+    assert first == cached == {'books': 1}
+    assert reloaded == {'books': 2}
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+@pytest.mark.asyncio
+async def test_response_cache_coalesces_concurrent_misses():
+    cache = ResponseCache(MemoryCacheBackend(maxsize=10, ttl=60))
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'novelists': []}
+
+    results = await asyncio.gather(
+        *(
+            cache.get_or_load('novelists', {'limit': 20}, load)
+            for _ in range(10)
+        )
+    )
+
+    assert calls == [1]
+    assert results == [{'novelists': []}] * 10
+    assert len(cache.single_flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_propagates_exceptions():
+    single_flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError('boom')
+
+    results = await asyncio.gather(
+        *(single_flight.do('key', fail) for _ in range(3)),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    expected_shared = 2
+    assert single_flight.shared == expected_shared
+    assert len(single_flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_leader_cancellation_spares_followers():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    leader = asyncio.create_task(single_flight.do('key', load))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(single_flight.do('key', load))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    expected_calls = 2
+    assert await follower == expected_calls
+    assert leader.cancelled()
+    assert len(single_flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_bypasses_coalescing_when_full():
+    single_flight = SingleFlight(max_keys=1)
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    await asyncio.gather(
+        single_flight.do('a', load),
+        single_flight.do('b', load),
+        single_flight.do('b', load),
+    )
+
+    expected_calls = 3
+    assert calls == expected_calls
+    assert single_flight.shared == 0
+    assert len(single_flight) == 0
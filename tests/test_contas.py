@@ -1,5 +1,11 @@
 from http import HTTPStatus
 
+import pytest
+
+from madr_fastapi.models import User
+from madr_fastapi.profiling import QueryCounter
+from madr_fastapi.security import user_cache
+
 
 def test_create_account(client):
     response = client.post(
@@ -105,3 +111,60 @@ def test_delete_account_forbidden_error(client, token):
     assert response.json() == {
         'detail': 'You are not allowed to delete this user'
     }
+
+
+def test_create_account_round_trips(client, engine):
+    with QueryCounter(engine) as queries:
+        client.post(
+            '/conta/',
+            json={
+                'username': 'teste',
+                'email': 'teste@gmail.com',
+                'password': 'teste',
+            },
+        )
+
+    expected_queries = 2
+    assert queries.count == expected_queries
+
+
+def test_update_account_from_cached_user_changes_password(client, user, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    body = {'username': 'novo', 'email': 'novo@gmail.com', 'password': 'new'}
+    client.put(f'/conta/{user.id + 1}', headers=headers, json=body)
+
+    response = client.put(f'/conta/{user.id}', headers=headers, json=body)
+    assert response.status_code == HTTPStatus.OK
+
+    response = client.post(
+        '/auth/token',
+        data={'username': 'novo@gmail.com', 'password': 'new'},
+    )
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.asyncio
+async def test_update_account_revokes_past_stale_cached_version(
+    client, user, token
+):
+    first = {'username': 'novo', 'email': 'novo@gmail.com', 'password': 'a'}
+    second = {**first, 'password': 'b'}
+    client.put(
+        f'/conta/{user.id}',
+        headers={'Authorization': f'Bearer {token}'},
+        json=first,
+    )
+    new_token = client.post(
+        '/auth/token',
+        data={'username': first['email'], 'password': first['password']},
+    ).json()['access_token']
+    headers = {'Authorization': f'Bearer {new_token}'}
+
+    stale = User(username='novo', email='novo@gmail.com', password='')
+    stale.id = user.id
+    stale.token_version = 0
+    await user_cache.set(user.id, stale)
+    client.put(f'/conta/{user.id}', headers=headers, json=second)
+    response = client.put(f'/conta/{user.id}', headers=headers, json=second)
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from madr_fastapi.database import (
+    InstrumentedPool,
+    engine_options,
+    engines,
+    make_engine,
+    pool_status,
+)
+from madr_fastapi.profiling import profiler
+from madr_fastapi.settings import Settings
+
+
+def test_engine_options_statement_timeout():
+    settings = Settings(DATABASE_STATEMENT_TIMEOUT_MS=5000)
+
+    options = engine_options(settings)
+
+    assert options['connect_args'] == {'options': '-c statement_timeout=5000'}
+
+
+def test_engine_options_pgbouncer_disables_prepared_statements():
+    settings = Settings(
+        DATABASE_PGBOUNCER=True, DATABASE_STATEMENT_TIMEOUT_MS=5000
+    )
+
+    options = engine_options(settings)
+
+    assert options['connect_args'] == {'prepare_threshold': None}
+
+
+@pytest.mark.asyncio
+async def test_instrumented_pool_records_checkouts(engine):
+    instrumented = create_async_engine(engine.url, poolclass=InstrumentedPool)
+
+    async with instrumented.connect() as conn:
+        await conn.execute(text('SELECT 1'))
+
+    await instrumented.dispose()
+    status = pool_status(instrumented)
+    assert status['checkouts'] == 1
+    assert 'checked_out' in status
+
+
+@pytest.mark.asyncio
+async def test_make_engine_instruments_every_engine(engine):
+    replica = make_engine('replica-test', engine.url, Settings())
+
+    try:
+        assert engines['replica-test'] is replica
+        assert isinstance(replica.pool, InstrumentedPool)
+        assert replica.sync_engine in profiler._engines
+    finally:
+        del engines['replica-test']
+        await replica.dispose()
@@ -1,8 +1,19 @@
+import asyncio
+import json
 from http import HTTPStatus
 
 import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from tests.conftest import NovelistFactory
+from madr_fastapi.app import app
+from madr_fastapi.cache import lookups
+from madr_fastapi.database import get_session
+from madr_fastapi.importer import iter_lines
+from madr_fastapi.profiling import QueryCounter
+from madr_fastapi.routers import livros
+from tests.conftest import BookFactory, NovelistFactory
 
 
 def test_create_book(client, token, novelist):
@@ -122,8 +133,434 @@ def test_get_book_by_id_not_found_error(client, token):
 
 def test_get_book_by_parameters(client, token, book):
     response = client.get(
-        '/livro/?title=nome&year=199',
+        '/livro/?title=nome&year=199&year_match=contains',
         headers={'Authorization': f'Bearer {token}'},
     )
     assert response.status_code == HTTPStatus.OK
     assert len(response.json()['books']) == 1
+
+
+@pytest.mark.asyncio
+async def test_get_books_by_cursor(session, client, token, novelist):
+    session.add_all(BookFactory.create_batch(3, novelist_id=novelist.id))
+    await session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+    page_size = 2
+
+    first_page = client.get(
+        f'/livro/?limit={page_size}', headers=headers
+    ).json()
+    second_page = client.get(
+        f'/livro/?limit={page_size}&cursor={first_page["next_cursor"]}',
+        headers=headers,
+    ).json()
+
+    assert len(first_page['books']) == page_size
+    assert len(second_page['books']) == 1
+    assert second_page['next_cursor'] is None
+
+
+@pytest.mark.asyncio
+async def test_get_books_by_relevance(session, client, token, novelist):
+    session.add_all([
+        BookFactory(title='dom casmurro comentado', novelist_id=novelist.id),
+        BookFactory(title='dom casmurro', novelist_id=novelist.id),
+    ])
+    await session.commit()
+
+    response = client.get(
+        '/livro/?title=Dom Casmurro&sort=relevance',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['books'][0]['title'] == 'dom casmurro'
+
+
+def test_get_book_by_exact_year(client, token, book):
+    headers = {'Authorization': f'Bearer {token}'}
+
+    exact = client.get(f'/livro/?year={book.year}', headers=headers)
+    partial = client.get('/livro/?year=199', headers=headers)
+
+    assert len(exact.json()['books']) == 1
+    assert partial.json()['books'] == []
+
+
+@pytest.mark.asyncio
+async def test_get_books_by_year_range(session, client, token, novelist):
+    for year in (1899, 1900, 1909, 1910):
+        session.add(
+            BookFactory(
+                year=year, title=f'livro {year}', novelist_id=novelist.id
+            )
+        )
+    await session.commit()
+
+    response = client.get(
+        '/livro/?year_from=1900&year_to=1909',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert [b['year'] for b in response.json()['books']] == [1900, 1909]
+
+
+def test_import_books_ndjson(client, token, book):
+    body = '\n'.join([
+        '{"title": "Dom Casmurro", "year": 1899, "novelist_id": %d}',
+        '{"title": "%s", "year": 1900, "novelist_id": %d}',
+        '{"title": "Quincas Borba", "year": 1891, "novelist_id": 99}',
+        'not json',
+        '{"title": "dom casmurro", "year": 1899, "novelist_id": %d}',
+    ]) % (book.novelist_id, book.title, book.novelist_id, book.novelist_id)
+
+    response = client.post(
+        '/livro/import',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/x-ndjson',
+        },
+        content=body,
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'imported': 1,
+        'failed': 4,
+        'errors': [
+            {'line': 2, 'detail': 'Book already created'},
+            {'line': 3, 'detail': 'Novelist id is invalid'},
+            {'line': 4, 'detail': 'Invalid row'},
+            {'line': 5, 'detail': 'Book already created'},
+        ],
+    }
+
+
+def test_import_books_csv(client, token, novelist):
+    body = (
+        'title,year,novelist_id\n'
+        f'Iracema,1865,{novelist.id}\n'
+        f'"O Guarani, edição especial",1857,{novelist.id}\n'
+    )
+
+    response = client.post(
+        '/livro/import',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'text/csv',
+        },
+        content=body,
+    )
+
+    assert response.json() == {'imported': 2, 'failed': 0, 'errors': []}
+
+
+def test_import_books_caps_detailed_errors(client, token, monkeypatch):
+    max_errors = 2
+    expected_failed = 5
+    monkeypatch.setattr(livros.settings, 'IMPORT_MAX_ERRORS', max_errors)
+
+    response = client.post(
+        '/livro/import',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/x-ndjson',
+        },
+        content='\n'.join(['not json'] * expected_failed),
+    )
+
+    assert response.json() == {
+        'imported': 0,
+        'failed': expected_failed,
+        'errors': [
+            {'line': 1, 'detail': 'Invalid row'},
+            {'line': 2, 'detail': 'Invalid row'},
+        ],
+    }
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_drops_overlong_lines_as_they_stream():
+    async def stream():
+        for chunk in (b'ab\nc', b'x' * 10, b'x' * 10, b'\nde\n', b'fg'):
+            yield chunk
+
+    lines = [line async for line in iter_lines(stream(), max_bytes=8)]
+
+    assert lines == [b'ab', None, b'de', b'fg']
+
+
+def test_import_books_rejects_overlong_rows(
+    client, token, novelist, monkeypatch
+):
+    monkeypatch.setattr(livros.settings, 'IMPORT_MAX_LINE_BYTES', 100)
+    row = json.dumps({'title': 'Iracema', 'year': 1865, 'novelist_id': 1})
+
+    response = client.post(
+        '/livro/import',
+        headers={
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/x-ndjson',
+        },
+        content=iter([row.encode(), b'\n', b'x' * 1000, b'x' * 1000]),
+    )
+
+    assert response.json() == {
+        'imported': 1,
+        'failed': 1,
+        'errors': [{'line': 2, 'detail': 'Row is too long'}],
+    }
+
+
+@pytest.mark.asyncio
+async def test_import_books_survives_novelist_deleted_mid_chunk(
+    client, session, engine, token
+):
+    session.add_all(NovelistFactory.build_batch(2))
+    await session.commit()
+    body = '\n'.join(
+        json.dumps({'title': f'livro {n}', 'year': 1900, 'novelist_id': n})
+        for n in (1, 2)
+    )
+
+    # The chunk's rollback undoes the delete too, so it is repeated before
+    # every insert to keep the novelist gone for the row-by-row retry.
+    def delete_novelist(conn, cursor, statement, *args):
+        if statement.startswith('INSERT INTO books'):
+            cursor.execute('DELETE FROM novelists WHERE id = 2')
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', delete_novelist)
+    try:
+        response = client.post(
+            '/livro/import',
+            headers={
+                'Authorization': f'Bearer {token}',
+                'Content-Type': 'application/x-ndjson',
+            },
+            content=body,
+        )
+    finally:
+        event.remove(
+            engine.sync_engine, 'before_cursor_execute', delete_novelist
+        )
+
+    assert response.json() == {
+        'imported': 1,
+        'failed': 1,
+        'errors': [{'line': 2, 'detail': 'Book could not be imported'}],
+    }
+
+
+def test_export_books_ndjson(client, token, book, novelist):
+    response = client.get(
+        '/livro/export', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {
+            'id': book.id,
+            'title': book.title,
+            'year': book.year,
+            'novelist_id': novelist.id,
+            'novelist': novelist.name,
+        }
+    ]
+
+
+def test_export_books_csv(client, token, book, novelist):
+    response = client.get(
+        '/livro/export?format=csv',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.text.splitlines() == [
+        'id,title,year,novelist_id,novelist',
+        f'{book.id},{book.title},{book.year},{novelist.id},{novelist.name}',
+    ]
+
+
+def test_write_book_round_trips(client, engine, token, novelist):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get('/livro/1', headers=headers)
+
+    with QueryCounter(engine) as create_queries:
+        response = client.post(
+            '/livro/',
+            headers=headers,
+            json={'year': 1899, 'title': 'Dom Casmurro', 'novelist_id': 1},
+        )
+    with QueryCounter(engine) as update_queries:
+        client.patch(
+            f'/livro/{response.json()["id"]}',
+            headers=headers,
+            json={'year': 1900},
+        )
+
+    expected_queries = 2
+    assert create_queries.count == expected_queries
+    assert update_queries.count == expected_queries
+
+
+@pytest.mark.asyncio
+async def test_get_books_with_author(session, client, engine, token):
+    novelists = NovelistFactory.create_batch(5)
+    session.add_all(novelists)
+    await session.commit()
+    session.add_all(
+        BookFactory(novelist_id=novelist.id) for novelist in novelists
+    )
+    await session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get('/livro/0', headers=headers)
+
+    with QueryCounter(engine) as queries:
+        response = client.get('/livro/with-author?limit=10', headers=headers)
+
+    books = response.json()['books']
+    assert [book['author']['id'] for book in books] == [
+        novelist.id for novelist in novelists
+    ]
+    assert queries.count == 1
+
+
+def test_get_book_by_id_not_modified(client, token, book):
+    headers = {'Authorization': f'Bearer {token}'}
+    response = client.get(f'/livro/{book.id}', headers=headers)
+    etag = response.headers['etag']
+
+    cached = client.get(
+        f'/livro/{book.id}', headers={**headers, 'If-None-Match': etag}
+    )
+    client.patch(f'/livro/{book.id}', headers=headers, json={'year': 2000})
+    changed = client.get(
+        f'/livro/{book.id}', headers={**headers, 'If-None-Match': etag}
+    )
+
+    assert response.headers['cache-control'] == 'private, no-cache'
+    assert 'last-modified' in response.headers
+    assert cached.status_code == HTTPStatus.NOT_MODIFIED
+    assert not cached.content
+    assert changed.status_code == HTTPStatus.OK
+    assert changed.headers['etag'] != etag
+
+
+def test_get_book_by_id_if_modified_since(client, token, book):
+    headers = {'Authorization': f'Bearer {token}'}
+    response = client.get(f'/livro/{book.id}', headers=headers)
+
+    cached = client.get(
+        f'/livro/{book.id}',
+        headers={
+            **headers,
+            'If-Modified-Since': response.headers['last-modified'],
+        },
+    )
+
+    assert cached.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_get_books_collection_etag(client, token, book, novelist):
+    headers = {'Authorization': f'Bearer {token}'}
+    etag = client.get('/livro/', headers=headers).headers['etag']
+
+    cached = client.get('/livro/', headers={**headers, 'If-None-Match': etag})
+    client.post(
+        '/livro/',
+        headers=headers,
+        json={'year': 1899, 'title': 'Dom Casmurro', 'novelist_id': 1},
+    )
+    changed = client.get('/livro/', headers={**headers, 'If-None-Match': etag})
+
+    assert cached.status_code == HTTPStatus.NOT_MODIFIED
+    expected_books = 2
+    assert changed.status_code == HTTPStatus.OK
+    assert len(changed.json()['books']) == expected_books
+
+
+def test_get_books_etag_covers_total(client, token, book, novelist):
+    headers = {'Authorization': f'Bearer {token}'}
+    url = '/livro/?limit=1&include_total=true'
+    etag = client.get(url, headers=headers).headers['etag']
+
+    client.post(
+        '/livro/',
+        headers=headers,
+        json={'year': 1899, 'title': 'Dom Casmurro', 'novelist_id': 1},
+    )
+    changed = client.get(url, headers={**headers, 'If-None-Match': etag})
+
+    expected_total = 2
+    assert changed.status_code == HTTPStatus.OK
+    assert changed.json()['total'] == expected_total
+
+
+def test_get_books_served_from_catalogue_cache(client, engine, token, book):
+    headers = {'Authorization': f'Bearer {token}'}
+    original_year = book.year
+    client.get('/livro/', headers=headers)
+
+    with QueryCounter(engine) as queries:
+        cached = client.get('/livro/', headers=headers)
+    client.patch(f'/livro/{book.id}', headers=headers, json={'year': 2000})
+    changed = client.get('/livro/', headers=headers)
+
+    assert queries.count == 0
+    assert cached.json()['books'][0]['year'] == original_year
+    expected_year = 2000
+    assert changed.json()['books'][0]['year'] == expected_year
+
+
+@pytest.mark.asyncio
+async def test_concurrent_get_book_by_id_shares_one_query(engine, book, token):
+    async def get_session_override():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_session_override
+    headers = {'Authorization': f'Bearer {token}'}
+    requests = 20
+    shared_before = lookups.shared
+    try:
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url='http://test'
+        ) as client:
+            with QueryCounter(engine) as queries:
+                responses = await asyncio.gather(
+                    *(
+                        client.get(f'/livro/{book.id}', headers=headers)
+                        for _ in range(requests)
+                    )
+                )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert all(r.status_code == HTTPStatus.OK for r in responses)
+    assert len({r.headers['etag'] for r in responses}) == 1
+    book_queries = [s for s in queries.statements if 'FROM books' in s]
+    assert len(book_queries) < requests
+    assert lookups.shared > shared_before
+    assert len(lookups) == 0
+
+
+@pytest.mark.asyncio
+async def test_get_books_with_filtered_total(client, session, token):
+    session.add(NovelistFactory())
+    await session.commit()
+    session.add_all(
+        BookFactory(year=year, title=f'livro {year}', novelist_id=1)
+        for year in (1880, 1890, 1900, 1910)
+    )
+    await session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    unfiltered = client.get('/livro/?limit=1', headers=headers).json()
+    filtered = client.get(
+        '/livro/?year_from=1900&include_total=true', headers=headers
+    ).json()
+
+    expected_total = 2
+    assert unfiltered['total'] is None
+    assert filtered['total'] == expected_total
+    assert filtered['total_estimated'] is False
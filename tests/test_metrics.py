@@ -0,0 +1,79 @@
+import os
+from http import HTTPStatus
+
+from madr_fastapi import metrics
+from madr_fastapi.metrics import Histogram, registry
+
+
+def test_metrics_endpoint_reports_requests(client):
+    client.get('/')
+
+    response = client.get('/metrics')
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'].startswith('text/plain')
+    assert (
+        'http_requests_total{method="GET",route="/",status="200"}'
+        in response.text
+    )
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/"}'
+        in response.text
+    )
+    assert 'http_requests_in_progress 1.0' in response.text
+    assert 'db_pool{engine="primary",state="checked_out"}' in response.text
+
+
+def test_metrics_endpoint_reports_password_hashing(client, user):
+    client.post(
+        '/auth/token',
+        data={'username': user.email, 'password': user.clean_password},
+    )
+
+    response = client.get('/metrics')
+
+    assert (
+        'password_hash_duration_seconds_count{operation="verify"}'
+        in response.text
+    )
+
+
+def test_metrics_unmatched_routes_share_a_label(client):
+    client.get('/nao-existe/1')
+
+    response = client.get('/metrics')
+
+    assert (
+        'http_requests_total{method="GET",route="unmatched",status="404"}'
+        in response.text
+    )
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram('test_seconds', 'Test.', buckets=(0.1, 1.0))
+    registry.remove(histogram)
+    child = histogram.labels()
+    for value in (0.05, 0.5, 5):
+        child.observe(value)
+
+    assert histogram.render().splitlines()[2:] == [
+        'test_seconds_bucket{le="0.1"} 1',
+        'test_seconds_bucket{le="1.0"} 2',
+        'test_seconds_bucket{le="+Inf"} 3',
+        'test_seconds_sum 5.55',
+        'test_seconds_count 3',
+    ]
+
+
+def test_metrics_label_series_by_worker(client, monkeypatch):
+    monkeypatch.setattr(metrics.settings, 'METRICS_WORKER_LABEL', True)
+    client.get('/')
+
+    response = client.get('/metrics')
+
+    worker = f'worker="{os.getpid()}"'
+    assert (
+        f'http_requests_total{{method="GET",route="/",status="200",{worker}}}'
+        in response.text
+    )
+    assert f'http_requests_in_progress{{{worker}}} 1.0' in response.text
@@ -0,0 +1,50 @@
+import logging
+
+import pytest
+
+from madr_fastapi.profiling import RequestProfile, profiler
+
+
+@pytest.fixture
+def sql_profiling(engine, monkeypatch):
+    profiler.install(engine)
+    monkeypatch.setattr(profiler, 'enabled', True)
+
+
+def test_server_timing_header(client, token, book, sql_profiling):
+    response = client.get(
+        '/livro/', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    server_timing = response.headers['server-timing']
+    assert server_timing.startswith('db;desc="')
+    assert 'db-slowest;dur=' in server_timing
+
+
+def test_server_timing_disabled_by_default(client):
+    response = client.get('/')
+
+    assert 'server-timing' not in response.headers
+
+
+def test_sql_profile_is_logged(client, token, book, sql_profiling, caplog):
+    with caplog.at_level(logging.INFO, logger='madr_fastapi.profiling'):
+        client.get('/livro/', headers={'Authorization': f'Bearer {token}'})
+
+    record = next(r for r in caplog.records if hasattr(r, 'sql_profile'))
+    assert record.sql_profile['path'] == '/livro/'
+    assert record.sql_profile['query_count'] >= 1
+
+
+def test_request_profile_flags_repeated_statements():
+    profile = RequestProfile()
+    for _ in range(3):
+        profile.record('SELECT * FROM books\n WHERE id = ?', 0.001)
+    profile.record('SELECT * FROM novelists', 0.002)
+
+    expected_repeats = 3
+    assert profile.repeated(threshold=3) == {
+        'SELECT * FROM books WHERE id = ?': expected_repeats
+    }
+    assert 'db-n-plus-one;desc="3"' in profile.server_timing(threshold=3)
+    assert profile.slowest_statement == 'SELECT * FROM novelists'
@@ -0,0 +1,116 @@
+import asyncio
+import sys
+from http import HTTPStatus
+from types import SimpleNamespace
+
+import pytest
+
+from madr_fastapi import cache
+from madr_fastapi.cache import create_cache_backend
+from madr_fastapi.metrics import PASSWORD_HASH_DURATION
+from madr_fastapi.ratelimit import (
+    MemoryBucketStore,
+    create_bucket_store,
+    login_ip_limiter,
+    login_user_limiter,
+    signup_ip_limiter,
+)
+
+verify_duration = PASSWORD_HASH_DURATION.labels('verify')
+hash_duration = PASSWORD_HASH_DURATION.labels('hash')
+
+
+@pytest.mark.asyncio
+async def test_memory_bucket_store_spends_and_refills():
+    store = MemoryBucketStore(maxsize=10)
+    capacity = 2
+
+    assert await store.take('key', capacity, rate=1) == 0
+    assert await store.take('key', capacity, rate=1) == 0
+    assert await store.take('key', capacity, rate=1) > 0
+    await asyncio.sleep(0.01)
+    assert await store.take('key', capacity, rate=1000) == 0
+
+
+@pytest.mark.asyncio
+async def test_memory_bucket_store_is_bounded():
+    store = MemoryBucketStore(maxsize=2)
+
+    for key in ('a', 'b', 'c'):
+        await store.take(key, 1, rate=1)
+
+    expected_size = 2
+    assert len(store) == expected_size
+    assert await store.take('a', 1, rate=1) == 0
+
+
+class FakeRedis:
+    @classmethod
+    def from_url(cls, url):
+        return cls()
+
+    @staticmethod
+    def register_script(script):
+        return script
+
+
+def test_bucket_store_shares_the_cache_redis_client(monkeypatch):
+    redis = SimpleNamespace(asyncio=SimpleNamespace(Redis=FakeRedis))
+    monkeypatch.setitem(sys.modules, 'redis', redis)
+    monkeypatch.setitem(sys.modules, 'redis.asyncio', redis.asyncio)
+    monkeypatch.setattr(cache, '_redis_clients', {})
+    url = 'redis://localhost:6379/0'
+
+    backend = create_cache_backend(url, maxsize=10, ttl=60)
+    store = create_bucket_store(url, maxsize=10)
+
+    assert store._redis is backend._redis
+
+
+def test_login_rate_limited_by_username_before_hashing(
+    client, user, monkeypatch
+):
+    monkeypatch.setattr(login_user_limiter, 'capacity', 2)
+    data = {'username': user.email, 'password': 'wrong'}
+
+    for _ in range(2):
+        client.post('/auth/token', data=data)
+    verifications = verify_duration.count
+    response = client.post(
+        '/auth/token', data={**data, 'username': user.email.upper()}
+    )
+
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert int(response.headers['retry-after']) > 0
+    assert verify_duration.count == verifications
+
+
+def test_login_rate_limited_by_ip(client, user, monkeypatch):
+    monkeypatch.setattr(login_ip_limiter, 'capacity', 1)
+
+    first = client.post(
+        '/auth/token', data={'username': 'a@a.com', 'password': 'x'}
+    )
+    second = client.post(
+        '/auth/token', data={'username': 'b@b.com', 'password': 'x'}
+    )
+
+    assert first.status_code == HTTPStatus.UNAUTHORIZED
+    assert second.status_code == HTTPStatus.TOO_MANY_REQUESTS
+
+
+def test_signup_rate_limited_by_ip(client, monkeypatch):
+    monkeypatch.setattr(signup_ip_limiter, 'capacity', 1)
+    client.post(
+        '/conta/',
+        json={'username': 'a', 'email': 'a@a.com', 'password': 'secret'},
+    )
+    hashes = hash_duration.count
+
+    response = client.post(
+        '/conta/',
+        json={'username': 'b', 'email': 'b@b.com', 'password': 'secret'},
+    )
+
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert hash_duration.count == hashes
@@ -4,7 +4,8 @@ import factory
 import pytest
 
 from madr_fastapi.models import Novelist
-from tests.conftest import NovelistFactory
+from madr_fastapi.profiling import QueryCounter
+from tests.conftest import BookFactory, NovelistFactory
 
 
 def test_create_novelist(client, token):
@@ -125,3 +126,233 @@ async def test_get_novelist_by_parameters(client, session, token):
     )
     assert response.status_code == HTTPStatus.OK
     assert len(response.json()['novelists']) == expected_novelists
+
+
+@pytest.mark.asyncio
+async def test_get_novelists_by_cursor(client, session, token):
+    session.add_all(NovelistFactory.create_batch(5))
+    await session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    first_page = client.get('/romancista/?limit=3', headers=headers).json()
+    second_page = client.get(
+        f'/romancista/?limit=3&cursor={first_page["next_cursor"]}',
+        headers=headers,
+    ).json()
+
+    assert [n['id'] for n in first_page['novelists']] == [1, 2, 3]
+    assert [n['id'] for n in second_page['novelists']] == [4, 5]
+    assert second_page['next_cursor'] is None
+
+
+def test_get_novelists_by_invalid_cursor(client, token):
+    response = client.get(
+        '/romancista/?cursor=invalido',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {'detail': 'Invalid cursor'}
+
+
+@pytest.mark.asyncio
+async def test_get_novelists_by_relevance(client, session, token):
+    session.add_all([
+        Novelist(name='machado de assis jr'),
+        Novelist(name='assis'),
+        Novelist(name='machado de assis'),
+    ])
+    await session.commit()
+
+    response = client.get(
+        '/romancista/?name=machado de assis&sort=relevance',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert [n['name'] for n in response.json()['novelists']][:2] == [
+        'machado de assis',
+        'machado de assis jr',
+    ]
+    assert response.json()['next_cursor'] is None
+
+
+def test_get_novelists_by_relevance_rejects_cursor(client, token):
+    response = client.get(
+        '/romancista/?name=machado&sort=relevance&cursor=abc',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert response.json() == {
+        'detail': 'Cursor is only supported when sorting by id'
+    }
+
+
+def test_create_novelists_batch(client, token, novelist):
+    response = client.post(
+        '/romancista/batch',
+        headers={'Authorization': f'Bearer {token}'},
+        json=[
+            {'name': 'Machado de Assis'},
+            {'name': novelist.name},
+            {'name': 'machado de assis'},
+        ],
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {
+        'created': [{'id': novelist.id + 1, 'name': 'machado de assis'}],
+        'existing': [{'id': novelist.id, 'name': novelist.name}],
+    }
+
+
+def test_create_novelists_batch_rejects_oversized_body(
+    client, token, settings
+):
+    names = range(settings.NOVELIST_BATCH_MAX_SIZE + 1)
+
+    response = client.post(
+        '/romancista/batch',
+        headers={'Authorization': f'Bearer {token}'},
+        json=[{'name': f'novelist {n}'} for n in names],
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_get_novelist_with_books(
+    client, session, engine, token, novelist
+):
+    session.add_all(BookFactory.create_batch(3, novelist_id=novelist.id))
+    await session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get('/romancista/0', headers=headers)
+
+    with QueryCounter(engine) as queries:
+        response = client.get(
+            f'/romancista/{novelist.id}/books', headers=headers
+        )
+
+    expected_books = 3
+    expected_queries = 2
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()['name'] == novelist.name
+    assert len(response.json()['books']) == expected_books
+    assert queries.count == expected_queries
+
+
+@pytest.mark.asyncio
+async def test_get_novelist_with_books_is_paginated(
+    client, session, token, novelist
+):
+    session.add_all(BookFactory.create_batch(3, novelist_id=novelist.id))
+    await session.commit()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    first = client.get(
+        f'/romancista/{novelist.id}/books?limit=2', headers=headers
+    ).json()
+    second = client.get(
+        f'/romancista/{novelist.id}/books?limit=2'
+        f'&cursor={first["next_cursor"]}',
+        headers=headers,
+    ).json()
+
+    expected_first, expected_second = 2, 1
+    assert len(first['books']) == expected_first
+    assert len(second['books']) == expected_second
+    assert second['next_cursor'] is None
+
+
+def test_get_novelist_with_books_rejects_oversized_page(
+    client, token, novelist, settings
+):
+    response = client.get(
+        f'/romancista/{novelist.id}/books',
+        params={'limit': settings.MAX_PAGE_SIZE + 1},
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_get_novelist_with_books_only_takes_page_parameters(client):
+    operation = client.get('/openapi.json').json()['paths'][
+        '/romancista/{novelist_id}/books'
+    ]['get']
+
+    assert {p['name'] for p in operation['parameters']} == {
+        'novelist_id',
+        'offset',
+        'limit',
+        'cursor',
+    }
+
+
+def test_get_novelist_with_books_not_found_error(client, token):
+    response = client.get(
+        '/romancista/2/books', headers={'Authorization': f'Bearer {token}'}
+    )
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert response.json() == {'detail': 'Novelist id not found'}
+
+
+def test_get_novelist_by_id_not_modified(client, novelist, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    etag = client.get(f'/romancista/{novelist.id}', headers=headers).headers[
+        'etag'
+    ]
+
+    response = client.get(
+        f'/romancista/{novelist.id}',
+        headers={**headers, 'If-None-Match': f'W/"x", {etag}'},
+    )
+
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers['etag'] == etag
+
+
+def test_get_novelists_collection_etag(client, novelist, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    etag = client.get('/romancista/', headers=headers).headers['etag']
+
+    cached = client.get(
+        '/romancista/', headers={**headers, 'If-None-Match': etag}
+    )
+    client.delete(f'/romancista/{novelist.id}', headers=headers)
+    changed = client.get(
+        '/romancista/', headers={**headers, 'If-None-Match': etag}
+    )
+
+    assert cached.status_code == HTTPStatus.NOT_MODIFIED
+    assert changed.status_code == HTTPStatus.OK
+    assert changed.json()['novelists'] == []
+
+
+@pytest.mark.asyncio
+async def test_get_novelists_with_total(client, session, token):
+    session.add_all(NovelistFactory.create_batch(5))
+    await session.commit()
+
+    response = client.get(
+        '/romancista/?limit=2&include_total=true',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    expected_total = 5
+    body = response.json()
+    assert response.status_code == HTTPStatus.OK
+    assert body['total'] == expected_total
+    assert body['total_estimated'] is False
+
+
+def test_get_novelists_rejects_page_above_max(client, token, settings):
+    response = client.get(
+        f'/romancista/?limit={settings.MAX_PAGE_SIZE + 1}',
+        headers={'Authorization': f'Bearer {token}'},
+    )
+
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
@@ -5,7 +5,18 @@ from fastapi import HTTPException
 from freezegun import freeze_time
 from jwt import decode
 
-from madr_fastapi.security import create_access_token, get_current_user
+from madr_fastapi import security
+from madr_fastapi.metrics import AUTH_RESOLUTIONS
+from madr_fastapi.profiling import QueryCounter
+from madr_fastapi.routers import livros, romancistas
+from madr_fastapi.security import (
+    HashingPool,
+    create_access_token,
+    get_current_user,
+    get_principal,
+    user_cache,
+    verify_password,
+)
 
 
 def test_create_access_token(settings):
@@ -64,3 +75,112 @@ async def test_current_user_expired_signature_error(client, user):
 
     assert response.status_code == HTTPStatus.UNAUTHORIZED
     assert response.json() == {'detail': 'Could not validate credentials'}
+
+
+@pytest.mark.asyncio
+async def test_current_user_is_served_from_cache(session, user, token):
+    await get_current_user(session, token)
+    misses = user_cache.misses
+
+    cached = await get_current_user(session, token)
+
+    assert cached.id == user.id
+    assert user_cache.misses == misses
+    assert user_cache.hits > 0
+
+
+def test_access_token_carries_user_id_and_version(client, user, settings):
+    response = client.post(
+        '/auth/token',
+        data={'username': user.email, 'password': user.clean_password},
+    )
+
+    decoded = decode(
+        response.json()['access_token'],
+        settings.SECRET_KEY,
+        settings.ALGORITHM,
+    )
+    assert decoded['uid'] == user.id
+    assert decoded['ver'] == user.token_version
+
+
+def test_authenticated_routes_make_no_auth_queries(
+    client, user, token, engine, monkeypatch
+):
+    # Without CACHE_URL versions are only kept for a second; a slow run
+    # must not see the warm-up entry expire and query for it again.
+    monkeypatch.setattr(security.token_versions.backend, 'ttl', 3600)
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get('/livro/1', headers=headers)
+
+    with QueryCounter(engine) as queries:
+        client.get('/livro/1', headers=headers)
+        client.get('/romancista/', headers=headers)
+
+    assert not [s for s in queries.statements if 'users' in s]
+
+
+def test_update_account_invalidates_cached_user(client, user, token):
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get('/livro/1', headers=headers)
+    client.put(
+        f'/conta/{user.id}',
+        headers=headers,
+        json={'username': 'novo', 'email': 'novo@gmail.com', 'password': 'x'},
+    )
+
+    response = client.get('/livro/1', headers=headers)
+
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_hashing_pool_runs_in_executor():
+    pool = HashingPool(workers=1, max_pending=1)
+    hashed = await pool.run(security.get_password_hash, 'secret')
+    pool.shutdown()
+
+    assert verify_password('secret', hashed)
+    assert pool.pending == 0
+
+
+def test_login_service_unavailable_when_hashing_pool_saturated(
+    client, user, monkeypatch
+):
+    monkeypatch.setattr(
+        security, 'hashing_pool', HashingPool(workers=1, max_pending=0)
+    )
+
+    response = client.post(
+        '/auth/token',
+        data={'username': user.email, 'password': user.clean_password},
+    )
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.headers['retry-after'] == '1'
+
+
+def _auth_dependencies(dependant):
+    count = dependant.call in {get_principal, get_current_user}
+    return count + sum(_auth_dependencies(d) for d in dependant.dependencies)
+
+
+# Catalogue routers authenticate once, in their APIRouter dependencies.
+# Routes must not declare get_principal or get_current_user again;
+# get_current_user in particular resolves the principal a second time.
+@pytest.mark.parametrize('router', [livros.router, romancistas.router])
+def test_catalogue_routes_declare_auth_once(router):
+    for route in router.routes:
+        assert _auth_dependencies(route.dependant) == 1, route.path
+
+
+@pytest.mark.parametrize(
+    'path', ['/livro/', '/livro/1', '/romancista/', '/romancista/1']
+)
+def test_auth_resolves_once_per_request(client, token, path):
+    resolutions = AUTH_RESOLUTIONS.labels()
+    before = resolutions.value
+
+    client.get(path, headers={'Authorization': f'Bearer {token}'})
+
+    assert resolutions.value - before == 1
@@ -0,0 +1,33 @@
+import json
+
+import orjson
+
+from madr_fastapi.schemas import BookPublic, NovelistPublic
+from madr_fastapi.serialization import FastJSONResponse, dump_rows
+from tests.conftest import BookFactory, NovelistFactory
+
+
+def test_dump_rows_matches_validated_models():
+    books = BookFactory.build_batch(3)
+    novelists = NovelistFactory.build_batch(3)
+    for n, (book, novelist) in enumerate(zip(books, novelists), start=1):
+        book.id = novelist.id = n
+
+    assert dump_rows(BookPublic, books) == [
+        BookPublic.model_validate(book, from_attributes=True).model_dump()
+        for book in books
+    ]
+    assert dump_rows(NovelistPublic, novelists) == [
+        NovelistPublic.model_validate(novelist).model_dump()
+        for novelist in novelists
+    ]
+
+
+def test_fast_json_response_renders_compact_utf8():
+    content = {'books': [{'id': 1, 'title': 'memórias póstumas'}]}
+
+    response = FastJSONResponse(content)
+
+    assert response.body == orjson.dumps(content)
+    assert json.loads(response.body) == content
+    assert response.headers['content-type'] == 'application/json'
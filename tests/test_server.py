@@ -0,0 +1,87 @@
+import pytest
+
+from madr_fastapi import server
+
+CACHE_URL = 'redis://localhost:6379/0'
+
+
+@pytest.fixture
+def cpus(monkeypatch, tmp_path):
+    monkeypatch.setattr(server, 'CGROUP', tmp_path)
+    monkeypatch.setattr(
+        server.os,
+        'sched_getaffinity',
+        lambda pid: set(range(16)),
+        raising=False,
+    )
+    return tmp_path
+
+
+def test_cpu_limit_uses_affinity_without_quota(cpus):
+    expected_cpus = 16
+    (cpus / 'cpu.max').write_text('max 100000\n')
+
+    assert server.cpu_limit() == expected_cpus
+
+
+def test_cpu_limit_follows_cgroup_v2_quota(cpus):
+    expected_cpus = 2
+    (cpus / 'cpu.max').write_text('150000 100000\n')
+
+    assert server.cpu_limit() == expected_cpus
+
+
+def test_cpu_limit_follows_cgroup_v1_quota(cpus):
+    expected_cpus = 3
+    (cpus / 'cpu').mkdir()
+    (cpus / 'cpu' / 'cpu.cfs_quota_us').write_text('300000\n')
+    (cpus / 'cpu' / 'cpu.cfs_period_us').write_text('100000\n')
+
+    assert server.cpu_limit() == expected_cpus
+
+
+def test_workers_are_capped(cpus, monkeypatch, settings):
+    monkeypatch.setenv('CACHE_URL', CACHE_URL)
+
+    assert server.parse_args([]).workers == settings.SERVER_MAX_WORKERS
+
+
+def test_single_worker_without_shared_cache(cpus, monkeypatch):
+    monkeypatch.delenv('CACHE_URL', raising=False)
+
+    assert server.parse_args([]).workers == 1
+
+
+def test_several_workers_require_shared_cache(monkeypatch):
+    expected_workers = 2
+    workers = ['--workers', str(expected_workers)]
+    monkeypatch.delenv('CACHE_URL', raising=False)
+
+    with pytest.raises(SystemExit):
+        server.parse_args(workers)
+
+    args = server.parse_args([*workers, '--allow-per-process-state'])
+    assert args.workers == expected_workers
+
+
+def test_web_concurrency_overrides_cpu_count(monkeypatch):
+    expected_workers = 7
+    monkeypatch.setenv('CACHE_URL', CACHE_URL)
+    monkeypatch.setenv('WEB_CONCURRENCY', str(expected_workers))
+
+    assert server.parse_args([]).workers == expected_workers
+
+
+def test_cli_flags_override_settings(monkeypatch):
+    expected_port = 9000
+    monkeypatch.setenv('CACHE_URL', CACHE_URL)
+    args = server.parse_args([
+        '--workers',
+        '2',
+        '--port',
+        str(expected_port),
+        '--no-preload',
+    ])
+
+    assert args.port == expected_port
+    assert args.preload is False